@@ -0,0 +1,144 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.db.models import Value
+from django.db.models.functions import Lower
+
+
+class BloomFilter:
+    """
+    Set of strings answering "certainly absent" or "maybe present", sized for
+    capacity entries at the given false positive rate.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1000)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, value):
+        # double hashing, k positions out of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+
+class AccountFilter:
+    """
+    Bloom filters of the lowercased emails and usernames in use, so most signup
+    checks of free ones don't query the database. Kept in memory per process,
+    updated on signups and rebuilt in the background every
+    ACCOUNT_FILTER_REFRESH seconds to pick up the accounts created by other
+    processes; the unique indexes on lower(email) and lower(username) catch
+    those in the meantime.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.emails = self.usernames = None
+        self.built_at = None
+        # accounts added while a build runs, added to the new filters too
+        self.added = None
+
+    def build(self):
+        with self.lock:
+            self.added = []
+        count = User.objects.count()
+        # room to grow until the next rebuild
+        emails, usernames = BloomFilter(count * 2), BloomFilter(count * 2)
+        for email, username in User.objects.values_list('email', 'username').iterator():
+            if email:
+                emails.add(email.lower())
+            usernames.add(username.lower())
+        with self.lock:
+            for email, username in self.added:
+                if email:
+                    emails.add(email)
+                usernames.add(username)
+            self.emails, self.usernames = emails, usernames
+            self.added = None
+            self.built_at = time.monotonic()
+
+    def add(self, user):
+        email, username = user.email.lower(), user.username.lower()
+        with self.lock:
+            if self.built_at is not None:
+                if email:
+                    self.emails.add(email)
+                self.usernames.add(username)
+            if self.added is not None:
+                self.added.append((email, username))
+
+    def is_stale(self):
+        return self.built_at is None or \
+            time.monotonic() - self.built_at > getattr(settings, 'ACCOUNT_FILTER_REFRESH', 300)
+
+
+_filter = AccountFilter()
+_build_lock = threading.Lock()
+
+
+def get_account_filter():
+    """
+    Get the process-wide account filter, None until it is first built. Stale
+    filters are rebuilt in a background thread, requests keep using the
+    previous one meanwhile.
+    """
+    if _filter.is_stale() and _build_lock.acquire(blocking=False):
+        threading.Thread(target=build_in_background, name='account-filter', daemon=True).start()
+    return _filter if _filter.built_at is not None else None
+
+
+def build_account_filter():
+    """
+    Build the account filter in the calling thread.
+    """
+    with _build_lock:
+        _filter.build()
+
+
+def build_in_background():
+    close_old_connections()
+    try:
+        _filter.build()
+    finally:
+        close_old_connections()
+        _build_lock.release()
+
+
+def remember_account(user):
+    _filter.add(user)
+
+
+def is_taken(field_name, value, **conditions):
+    """
+    Check if an account uses value for field_name, ignoring case. Goes through
+    the lower() expression index when the filter can't rule it out, or isn't
+    built yet.
+    """
+    account_filter = get_account_filter()
+    if account_filter is not None and value.lower() not in getattr(account_filter, f'{field_name}s'):
+        return False
+    return User.objects.alias(lowered=Lower(field_name)).filter(lowered=Lower(Value(value)), **conditions).exists()
+
+
+def email_taken(email):
+    # the index on lower(email) only covers the accounts having one
+    return is_taken('email', email, email__gt='')
+
+
+def username_taken(username):
+    return is_taken('username', username)
@@ -1,25 +1,79 @@
+import pickle
+
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend, UserModel
-from django.contrib.auth.models import User
-from django.core.exceptions import MultipleObjectsReturned
-from django.db.models import Q
+from django.db import router
+from django.db.models import Q, Value
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Lower
+
+from .cache import LocalTier
+from .models import Profile
+
+
+# user id -> pickled field values of the user and its profile, which the
+# authentication middleware and most pages load on every request. Saves in this
+# process evict their entry, the ones made through other processes show up
+# within USER_CACHE_TIMEOUT seconds.
+_users = LocalTier(getattr(settings, 'USER_CACHE_MAX_ENTRIES', 10000), getattr(settings, 'USER_CACHE_TIMEOUT', 10))
+
+
+def forget_user(user_id):
+    _users.delete(user_id)
+
+
+def get_field_names(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def dump(instance):
+    # files are kept by name, a FieldFile pickles its instance along
+    return tuple(value.name if isinstance(value, FieldFile) else value
+                 for value in (getattr(instance, name) for name in get_field_names(type(instance))))
+
+
+def load_user(values):
+    db = router.db_for_read(UserModel)
+    user_values, profile_values = pickle.loads(values)
+    user = UserModel.from_db(db, get_field_names(UserModel), user_values)
+    profile = None
+    if profile_values is not None:
+        profile = Profile.from_db(db, get_field_names(Profile), profile_values)
+        profile._state.fields_cache['user'] = user
+    # accessing user.profile doesn't query, like after select_related()
+    user._state.fields_cache['profile'] = profile
+    return user
 
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = UserModel.objects.get(Q(username__iexact=username) | Q(email__iexact=username))
-        except UserModel.DoesNotExist:
-            UserModel().set_password(password)
-        except MultipleObjectsReturned:
-            return User.objects.filter(email=username).order_by('id').first()
-        else:
+        if username is None or password is None:
+            return
+        # one query through the lower(email) and lower(username) indexes, see
+        # migration 0021. Several accounts match when the email of one is the
+        # username of another.
+        login = Lower(Value(username))
+        users = UserModel.objects.alias(email_lower=Lower('email'), username_lower=Lower('username')).filter(
+            Q(email_lower=login, email__gt='') | Q(username_lower=login)).order_by('id')
+        found = False
+        for user in users:
+            found = True
             if user.check_password(password) and self.user_can_authenticate(user):
                 return user
+        if not found:
+            # run the hasher anyway, the response time doesn't tell if the account exists
+            UserModel().set_password(password)
 
     def get_user(self, user_id):
-        try:
-            user = UserModel.objects.get(pk=user_id)
-        except UserModel.DoesNotExist:
-            return None
-
+        values = _users.get(user_id)
+        if values is not None:
+            user = load_user(values)
+        else:
+            # the profile in the same query, the pages all show the viewer's photo
+            user = UserModel.objects.select_related('profile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            profile = getattr(user, 'profile', None)
+            _users.set(user_id, pickle.dumps((dump(user), dump(profile) if profile is not None else None),
+                                             pickle.HIGHEST_PROTOCOL), None)
         return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+
+# per-user counters shown in the navbar, counted on a cache miss and forgotten
+# by the paths that change them
+UNREAD_CONVERSATIONS = 'badge_unread:{}'
+FRIEND_REQUESTS = 'badge_requests:{}'
+
+
+def count_unread_conversations(user):
+    from .models import Message
+    return Message.objects.filter(Q(sender=user) | Q(receiver=user)).unread_by(user).count()
+
+
+def count_friend_requests(user):
+    from .models import FriendRequests
+    return FriendRequests.objects.filter(receiver_user=user).count()
+
+
+COUNTERS = {
+    'unread_conversations': (UNREAD_CONVERSATIONS, count_unread_conversations),
+    'friend_requests': (FRIEND_REQUESTS, count_friend_requests),
+}
+
+
+def get_badges(user):
+    """
+    Get the user's badge counters, from the cache when they are there.
+    """
+    keys = {name: key.format(user.pk) for name, (key, _) in COUNTERS.items()}
+    values = cache.get_many(keys.values())
+    missing = {keys[name]: count(user) for name, (_, count) in COUNTERS.items() if keys[name] not in values}
+    if missing:
+        cache.set_many(missing, getattr(settings, 'BADGES_CACHE_TIMEOUT', 3600))
+        values.update(missing)
+    return {name: values[key] for name, key in keys.items()}
+
+
+def forget(key, *user_ids):
+    """
+    Drop cached counters once the current transaction commits, the next read
+    counts them again. Adjusting them in place would be a read-modify-write
+    of the shared file cache, racing with the other processes.
+    """
+    transaction.on_commit(lambda: cache.delete_many([key.format(user_id) for user_id in user_ids]))
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import posixpath
+import threading
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+# blobs are never modified, files derived from one (image variants) can be
+# reused as long as they exist
+BLOB_DIRECTORY = 'blobs'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_DIRECTORY + '/')
+
+
+def get_blob_name(digest, extension):
+    return posixpath.join(BLOB_DIRECTORY, digest[:2], digest[2:4], digest + extension.lower())
+
+
+def hash_file(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store(file, name):
+    """
+    Get the blob with the content of file, storing it if it is new. name is
+    only used for the extension. The returned blob has no reference counted yet.
+    """
+    from .models import Blob
+    digest = hash_file(file)
+    blob = Blob.objects.filter(sha256=digest).first()
+    if blob is not None:
+        return blob
+    storage = Blob._meta.get_field('file').storage
+    blob_name = get_blob_name(digest, os.path.splitext(name)[1])
+    if not storage.exists(blob_name):
+        saved = storage.save(blob_name, file)
+        if saved != blob_name:
+            # written meanwhile by another request, the storage saved this copy under a new name
+            storage.delete(saved)
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(sha256=digest, file=blob_name, size=file.size)
+    except IntegrityError:
+        # stored concurrently by another request
+        return Blob.objects.get(sha256=digest)
+
+
+# path of a default file (relative to BASE_DIR) -> its blob id, per process
+_defaults = {}
+_defaults_lock = threading.Lock()
+
+
+def get_default_blob(path):
+    """
+    Get the blob of one of the default pictures given to new users, stored the
+    first time a process uses it.
+    """
+    from .models import Blob
+    blob_id = _defaults.get(path)
+    blob = Blob.objects.filter(pk=blob_id).first() if blob_id is not None else None
+    if blob is None:
+        with _defaults_lock, open(os.path.join(settings.BASE_DIR, path), 'rb') as content:
+            blob = store(File(content), path)
+            _defaults[path] = blob.pk
+    return blob
+
+
+def set_blob(instance, field_name, blob):
+    """
+    Point a file field at a blob. The reference is counted when the instance is saved.
+    """
+    setattr(instance, field_name, blob.file.name)
+    setattr(instance, f'{field_name}_blob_id', blob.pk)
+
+
+def attach(instance, field_names):
+    """
+    Store the files uploaded to the fields as blobs and move the reference counts
+    from the blobs the saved row pointed at to the new ones. Called from save().
+    """
+    from .models import Blob
+    stored = {}
+    if not instance._state.adding:
+        stored = type(instance).objects.filter(pk=instance.pk).values(
+            *[f'{field_name}_blob_id' for field_name in field_names]).first() or {}
+    for field_name in field_names:
+        file = getattr(instance, field_name)
+        if file and not file._committed:
+            set_blob(instance, field_name, store(file, file.name))
+        elif not file:
+            setattr(instance, f'{field_name}_blob_id', None)
+        old, new = stored.get(f'{field_name}_blob_id'), getattr(instance, f'{field_name}_blob_id')
+        if old != new:
+            if old is not None:
+                Blob.objects.filter(pk=old).update(ref_count=F('ref_count') - 1)
+            if new is not None:
+                Blob.objects.filter(pk=new).update(ref_count=F('ref_count') + 1)
+
+
+def detach(instance, field_names):
+    """
+    Release the blobs of a deleted row.
+    """
+    from .models import Blob
+    for field_name in field_names:
+        blob_id = getattr(instance, f'{field_name}_blob_id')
+        if blob_id is not None:
+            Blob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
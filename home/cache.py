@@ -0,0 +1,304 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import badges
+
+
+class LocalTier:
+    """
+    LRU of pickled values private to the process. Entries live at most
+    local_timeout seconds so changes made through other processes show up.
+    """
+
+    def __init__(self, max_entries, local_timeout):
+        self.max_entries = max_entries
+        self.local_timeout = local_timeout
+        self.lock = threading.Lock()
+        # key -> (expiry as a time.time() value, pickled value)
+        self.entries = OrderedDict()
+        self.stats = Counter()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                self.entries.pop(key, None)
+                return None
+            self.entries.move_to_end(key)
+            self.stats['local_hits'] += 1
+        return entry[1]
+
+    def set(self, key, pickled, expiry):
+        local_expiry = time.time() + self.local_timeout
+        expiry = local_expiry if expiry is None else min(expiry, local_expiry)
+        with self.lock:
+            self.entries[key] = (expiry, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def delete(self, key):
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+
+# cache directory -> time.monotonic() of its last cull by this process
+_culled_at = {}
+
+
+class FileCache(FileBasedCache):
+    """
+    FileBasedCache listing its directory to cull at most every CULL_INTERVAL
+    seconds (OPTIONS, 60 by default) per process. The stock backend lists it on
+    every write, which makes each write cost O(entries). The directory may go
+    past MAX_ENTRIES in between.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self.cull_interval = params.get('OPTIONS', {}).get('CULL_INTERVAL', 60)
+
+    def _cull(self):
+        now = time.monotonic()
+        if now - _culled_at.get(self._dir, float('-inf')) < self.cull_interval:
+            return
+        _culled_at[self._dir] = now
+        super()._cull()
+
+
+# Django creates a cache instance per thread, the local tier is shared by all
+# the threads of the process
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend with an in-process LRU in front of a shared backend seen by
+    every process (OPTIONS['SHARED'], configured like a CACHES entry). Reads are
+    served from the LRU when they can, writes go through to both tiers.
+
+    OPTIONS:
+        MAX_ENTRIES: entries kept in the LRU
+        LOCAL_TIMEOUT: seconds an entry is served from the LRU without checking
+            the shared tier, the staleness bound across processes
+        SHARED: the shared tier
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        shared = dict(options['SHARED'])
+        shared.setdefault('TIMEOUT', params.get('TIMEOUT', 300))
+        self.shared = import_string(shared['BACKEND'])(shared.get('LOCATION', ''), shared)
+        with _local_tiers_lock:
+            if location not in _local_tiers:
+                _local_tiers[location] = LocalTier(self._max_entries, options.get('LOCAL_TIMEOUT', 5))
+            self.local = _local_tiers[location]
+
+    def remember(self, key, value, version, timeout=DEFAULT_TIMEOUT):
+        self.local.set(self.make_key(key, version), pickle.dumps(value, self.pickle_protocol),
+                       self.get_backend_timeout(timeout))
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            pickled = self.local.get(self.make_and_validate_key(key, version))
+            if pickled is not None:
+                found[key] = pickle.loads(pickled)
+            else:
+                missing.append(key)
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            self.local.count('shared_hits', len(shared))
+            self.local.count('misses', len(missing) - len(shared))
+            for key, value in shared.items():
+                # the shared tier doesn't tell the remaining lifetime, LOCAL_TIMEOUT bounds it
+                self.remember(key, value, version, None)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.remember(key, value, version, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version):
+            return False
+        self.remember(key, value, version, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self.remember(key, value, version, None)
+        return value
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_and_validate_key(key, version))
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.local.delete(self.make_and_validate_key(key, version))
+        self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.local.get(self.make_and_validate_key(key, version)) is not None or \
+            self.shared.has_key(key, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def get_stats(self):
+        with self.local.lock:
+            stats = dict(self.local.stats, entries=len(self.local.entries))
+        lookups = stats.get('local_hits', 0) + stats.get('shared_hits', 0) + stats.get('misses', 0)
+        stats['hit_rate'] = round(1 - stats.get('misses', 0) / lookups, 4) if lookups else None
+        return stats
+
+
+def get_stats():
+    """
+    Hit/miss counters of this process for every configured cache that keeps them.
+    """
+    return {alias: caches[alias].get_stats() for alias in settings.CACHES
+            if hasattr(caches[alias], 'get_stats')}
+
+
+# Versions
+# Cached values depending on a (namespace, id) pair embed its version in their
+# key, bumping the version invalidates all of them at once. Namespaces:
+#   user: a user's account and profile, by user id
+#   posts: the posts of a user and their counters, by author id
+#   post: a post, its comments and counters, by post id
+#   friends: a user's friend set, by user id
+#   feed: the posts delivered to a user's newsfeed and their counters, by user id
+#   viewer: anything the user did that changes how pages look to them, by user id
+
+def version_key(namespace, pk):
+    return f'version:{namespace}:{pk}'
+
+
+def new_version():
+    # a version key that got evicted must not restart at a number already used
+    return time.time_ns() // 1000
+
+
+def get_versions(*dependencies):
+    keys = [version_key(namespace, pk) for namespace, pk in dependencies]
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def versioned_key(name, *dependencies):
+    versions = get_versions(*dependencies)
+    return ':'.join([name] + [f'{namespace}.{pk}.{version}'
+                              for (namespace, pk), version in zip(dependencies, versions)])
+
+
+def bump_versions(*dependencies):
+    """
+    Invalidate what was cached against the dependencies, once the current
+    transaction commits: values cached before by other requests come from the
+    data before the change.
+    """
+    def bump():
+        # a new version rather than incr, which is a read and a write on the
+        # shared tier
+        cache.set_many({version_key(namespace, pk): new_version() for namespace, pk in set(dependencies)}, None)
+    transaction.on_commit(bump)
+
+
+def cached(name, dependencies, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Get a value cached under a versioned key, computing it on a miss.
+    """
+    key = versioned_key(name, *dependencies)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+class CachedViewMixin:
+    """
+    Cache the GET responses of a view per viewer. The cached response is dropped
+    when a version it depends on is bumped, or after cache_timeout seconds.
+
+    cache_versions lists (namespace, URL keyword argument) pairs, or
+    get_cache_versions can be overridden. The viewer's own version, CSRF token
+    and navbar badges are always part of the key.
+    """
+    cache_timeout = None
+    cache_versions = ()
+
+    def get_cache_versions(self, request, **kwargs):
+        """
+        Return the dependencies of the page, or None not to cache it.
+        """
+        return [(namespace, kwargs[kwarg]) for namespace, kwarg in self.cache_versions]
+
+    def get_cache_key(self, request, **kwargs):
+        # pages embed the CSRF token and would show the flash messages to come
+        if not request.user.is_authenticated or 'CSRF_COOKIE' not in request.META or \
+                len(messages.get_messages(request)):
+            return None
+        dependencies = self.get_cache_versions(request, **kwargs)
+        if dependencies is None:
+            return None
+        dependencies = [('viewer', request.user.pk), *dependencies]
+        key = versioned_key(f'view:{request.user.pk}', *dependencies)
+        digest = hashlib.md5(f'{request.get_full_path()}:{request.META["CSRF_COOKIE"]}:'
+                             f'{sorted(badges.get_badges(request.user).items())}'.encode(),
+                             usedforsecurity=False)
+        return f'{key}:{digest.hexdigest()}'
+
+    def dispatch(self, request, *args, **kwargs):
+        key = self.get_cache_key(request, **kwargs) if request.method == 'GET' else None
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+        response = cache.get(key)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                timeout = self.cache_timeout or getattr(settings, 'VIEW_CACHE_TIMEOUT', 60)
+                cache.set(key, response, timeout)
+        return response
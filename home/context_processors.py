@@ -0,0 +1,12 @@
+from django.utils.functional import SimpleLazyObject
+
+from .badges import get_badges
+
+
+def badges(request):
+    """
+    Expose the navbar badge counters as badges.unread_conversations and badges.friend_requests.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {'badges': SimpleLazyObject(lambda: get_badges(request.user))}
@@ -88,6 +88,8 @@ class SearchForm(forms.Form):
         self.fields['q'].widget.attrs['placeholder'] = 'Search'
         self.fields['q'].widget.attrs['required'] = 'true'
         self.fields['q'].widget.attrs['aria-label'] = 'Search'
+        self.fields['q'].widget.attrs['list'] = 'typeahead_results'
+        self.fields['q'].widget.attrs['autocomplete'] = 'off'
 
 
 class PostForm(forms.ModelForm):
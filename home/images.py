@@ -0,0 +1,169 @@
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from .blobs import is_blob
+
+
+# sent once the variants of an image field are written
+variants_saved = Signal()
+
+
+def get_variant_sizes(model, field_name):
+    return getattr(settings, 'IMAGE_VARIANTS', {}).get(f'{model._meta.label}.{field_name}', {})
+
+
+def get_image_fields(model):
+    return [field.name for field in model._meta.get_fields()
+            if get_variant_sizes(model, field.name) and hasattr(model, f'{field.name}_variants')]
+
+
+def get_variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def reset_variants(instance, update_fields=None):
+    """
+    Clear the variants of the image fields whose file changed since they were
+    built, a save with update_fields only checks the fields it writes. Returns
+    the names of these fields, to build them again once saved. The files of the
+    old variants are deleted once committed, unless built from a blob as other
+    rows use them too.
+    """
+    changed = []
+    for field_name in get_image_fields(type(instance)):
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        file = getattr(instance, field_name)
+        variants = getattr(instance, get_variants_field(field_name))
+        if not file._committed or (file.name or '') != variants.get('source', ''):
+            stale = [name for size, name in variants.items() if size != 'source']
+            if stale and not is_blob(variants.get('source')):
+                transaction.on_commit(partial(delete_files, file.storage, stale))
+            setattr(instance, get_variants_field(field_name), {})
+            changed.append(field_name)
+    return changed
+
+
+def get_update_fields(update_fields, changed):
+    # the reset variants are written by the same save
+    if update_fields is None:
+        return None
+    return [*update_fields, *[get_variants_field(field_name) for field_name in changed]]
+
+
+def delete_files(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def make_variant(image, width, height):
+    """
+    Resize an image to width, cropped to the width:height ratio when height is
+    given, never enlarging it. Returns the WebP encoded variant.
+    """
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    if height is not None:
+        scale = min(1, image.width / width, image.height / height)
+        image = ImageOps.fit(image, (max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail((width, image.height), Image.LANCZOS)
+    content = BytesIO()
+    image.save(content, 'WEBP', quality=getattr(settings, 'IMAGE_QUALITY', 80), method=4)
+    return content.getvalue()
+
+
+def build_variants(instance, field_name):
+    """
+    Generate the variants of an image field and save them on the instance. Files
+    that aren't raster images (documents, SVG, animations) get none and are
+    served as uploaded.
+    """
+    file = getattr(instance, field_name)
+    directory, basename = posixpath.split(os.path.splitext(file.name)[0])
+    targets = {name: posixpath.join(directory, 'variants', f'{basename}_{name}.webp')
+               for name in get_variant_sizes(type(instance), field_name)}
+    variants = {'source': file.name}
+    if is_blob(file.name) and all(file.storage.exists(target) for target in targets.values()):
+        # shared blob, built for another row already
+        variants.update(targets)
+        return save_variants(instance, field_name, variants)
+    try:
+        with file.storage.open(file.name) as source:
+            image = Image.open(source)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        image = None
+    if image is not None and not getattr(image, 'is_animated', False):
+        image = ImageOps.exif_transpose(image)
+        for name, (width, height) in get_variant_sizes(type(instance), field_name).items():
+            variants[name] = file.storage.save(targets[name], ContentFile(make_variant(image, width, height)))
+    save_variants(instance, field_name, variants)
+
+
+def save_variants(instance, field_name, variants):
+    # a queryset update, a save would bump the auto_now fields and show the
+    # row as edited. The receivers of variants_saved evict what shows the image.
+    setattr(instance, get_variants_field(field_name), variants)
+    type(instance).objects.filter(pk=instance.pk).update(**{get_variants_field(field_name): variants})
+    variants_saved.send(sender=type(instance), instance=instance, field_name=field_name)
+
+
+def run_job(model_label, pk, field_name, name):
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    # skipped if the file was replaced meanwhile, its own job builds the new one
+    if instance is not None and getattr(instance, field_name).name == name:
+        build_variants(instance, field_name)
+
+
+def run_background_job(*job):
+    close_old_connections()
+    try:
+        run_job(*job)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(getattr(settings, 'IMAGE_WORKERS', 2),
+                                               thread_name_prefix='image-variants')
+    return _executor
+
+
+def schedule_variants(instance, field_names):
+    """
+    Build the variants of the fields in the background once the transaction
+    commits. With IMAGE_WORKERS = 0 they are built in the request instead.
+    """
+    jobs = [(instance._meta.label, instance.pk, field_name, getattr(instance, field_name).name)
+            for field_name in field_names if getattr(instance, field_name)]
+    if not jobs:
+        return
+
+    def submit():
+        for job in jobs:
+            if getattr(settings, 'IMAGE_WORKERS', 2):
+                get_executor().submit(run_background_job, *job)
+            else:
+                run_job(*job)
+    transaction.on_commit(submit)
@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run a benchmark against a throwaway copy of the schema in a temporary file,
+    so the configured database is never touched. Yields the temporary directory.
+    """
+    directory = tempfile.mkdtemp(prefix='bench-')
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield directory
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def timer(results, name):
+    """
+    Store the wall-clock seconds spent in the block in results[name].
+    """
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
@@ -0,0 +1,67 @@
+import os
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from home.management.benchmark import scratch_database, timer
+from home.models import Post, Reaction
+from home.reactions import ReactionBuffer
+
+
+class Command(BaseCommand):
+    help = 'Measure sustained like/dislike toggles per second with and without the reaction buffer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Number of users clicking.')
+        parser.add_argument('--posts', type=int, default=3, help='Number of (viral) posts being clicked.')
+        parser.add_argument('--toggles', type=int, default=5000, help='Number of toggles to replay.')
+        parser.add_argument('--flush-size', type=int, default=500, help='Buffered toggles per flush.')
+        parser.add_argument('--flush-interval', type=float, default=1.0, help='Seconds between flushes.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with scratch_database() as directory:
+            users = User.objects.bulk_create([User(username=f'bench{i}', password='!')
+                                              for i in range(options['users'])])
+            author = users[0]
+            posts = []
+            for i in range(options['posts']):
+                post = Post(user=author, content=f'viral post {i}')
+                post.save()
+                posts.append(post.id)
+            clicks = [(rng.choice(users), rng.choice(posts), rng.choice(['like', 'dislike']))
+                      for _ in range(options['toggles'])]
+
+            results = {}
+            with timer(results, 'direct'):
+                for user, post_id, kind in clicks:
+                    Reaction.toggle(user, post_id, kind)
+            expected = self.snapshot(posts)
+
+            Reaction.objects.all().delete()
+            Post.objects.update(like_count=0, dislike_count=0)
+            buffer = ReactionBuffer(os.path.join(directory, 'reactions.journal'),
+                                    options['flush_interval'], options['flush_size'])
+            with timer(results, 'buffered'):
+                for user, post_id, kind in clicks:
+                    buffer.toggle(user, post_id, kind)
+            with timer(results, 'final flush'):
+                buffer.flush()
+            consistent = self.snapshot(posts) == expected
+
+        toggles = options['toggles']
+        self.stdout.write(f'{toggles} toggles from {options["users"]} users on {options["posts"]} post(s)')
+        for name in ['direct', 'buffered']:
+            self.stdout.write(f'{name:>12}: {results[name]:8.3f}s  {toggles / results[name]:10.0f} toggles/sec')
+        self.stdout.write(f'{"final flush":>12}: {results["final flush"]:8.3f}s')
+        if consistent:
+            self.stdout.write(self.style.SUCCESS('Buffered counters match the direct run.'))
+        else:
+            self.stdout.write(self.style.ERROR('Buffered counters differ from the direct run!'))
+
+    @staticmethod
+    def snapshot(posts):
+        return (list(Post.objects.filter(id__in=posts).order_by('id').values_list('like_count', 'dislike_count')),
+                sorted(Reaction.objects.values_list('user_id', 'post_id', 'kind')))
@@ -0,0 +1,87 @@
+import copy
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from home.management.benchmark import scratch_database, timer
+from home.models import Message, Post, Profile
+
+MODES = {
+    'db': ('django.contrib.sessions.backends.db', 'django.contrib.messages.storage.session.SessionStorage'),
+    'cached_db': ('django.contrib.sessions.backends.cached_db',
+                  'django.contrib.messages.storage.fallback.FallbackStorage'),
+    'signed_cookies': ('django.contrib.sessions.backends.signed_cookies',
+                       'django.contrib.messages.storage.fallback.FallbackStorage'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Count the django_session queries of the POST-heavy flows (reactions, comments, messages) per session mode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=50,
+                            help='Rounds of one reaction, one comment and one chat message.')
+
+    def handle(self, *args, **options):
+        with scratch_database() as directory:
+            viewer, friend = self.populate()
+            self.stdout.write(f'{"mode":>15} {"writes":>7} {"reads":>7} {"queries":>8} {"ms/round":>9} '
+                              f'{"cookie B":>9}  (session queries per round, largest cookie)')
+            for mode, (engine, storage) in MODES.items():
+                # new ones per mode, pages with more comments would be slower to render
+                post = Post.objects.create(user=friend, content=f'bench post {mode}')
+                message = Message.objects.create(sender=viewer, receiver=friend)
+                with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage, ALLOWED_HOSTS=['testserver'],
+                                       CACHES=self.get_caches(os.path.join(directory, mode))):
+                    counts, seconds, cookie = self.measure(viewer, post, message, options['rounds'])
+                self.stdout.write(f'{mode:>15} {counts["writes"] / options["rounds"]:7.2f} '
+                                  f'{counts["reads"] / options["rounds"]:7.2f} '
+                                  f'{counts["queries"] / options["rounds"]:8.1f} '
+                                  f'{seconds / options["rounds"] * 1000:9.2f} {cookie:9}')
+
+    @staticmethod
+    def get_caches(directory):
+        # the configured caches, their shared tiers in the scratch directory
+        caches = copy.deepcopy(settings.CACHES)
+        for alias, config in caches.items():
+            if 'SHARED' in config.get('OPTIONS', {}):
+                config['LOCATION'] = f'bench-{os.path.basename(directory)}-{alias}'
+                config['OPTIONS']['SHARED']['LOCATION'] = os.path.join(directory, alias)
+        return caches
+
+    @staticmethod
+    def populate():
+        viewer, friend = User.objects.bulk_create([
+            User(username=f'bench{i}', first_name='Bench', last_name=str(i), email=f'bench{i}@example.com',
+                 password='!') for i in range(2)])
+        Profile.objects.bulk_create([Profile(user=user, profile_pic='bench.png', cover_pic='bench.svg')
+                                     for user in (viewer, friend)])
+        viewer.profile.friends.add(friend.profile)
+        return viewer, friend
+
+    @staticmethod
+    def measure(viewer, post, message, rounds):
+        client = Client()
+        client.force_login(viewer)
+        counts, results, cookie = Counter(), {}, 0
+        with CaptureQueriesContext(connection) as queries, timer(results, 'flows'):
+            for i in range(rounds):
+                # like, comment then view the post with its flash message, chat
+                client.post(reverse('post_react', args=[post.id]), {'action': 'like'})
+                client.post(reverse('post_detail', args=[post.id]),
+                            {'new_comment': '', 'content': f'bench comment {i}'}, follow=True)
+                cookie = max([cookie, *[len(morsel.value) for morsel in client.cookies.values()]])
+                client.post(reverse('message_detail', args=[message.id]),
+                            {'send_message': '', 'content': f'bench message {i}'}, follow=True)
+        for query in queries.captured_queries:
+            if 'django_session' in query['sql']:
+                counts['reads' if query['sql'].startswith('SELECT') else 'writes'] += 1
+        counts['queries'] = len(queries.captured_queries)
+        return counts, results['flows'], cookie
@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home.accounts import build_account_filter, email_taken, username_taken
+from home.management.benchmark import scratch_database, timer
+
+
+class Command(BaseCommand):
+    help = 'Measure the duplicate checks and user creation of a signup as the number of users grows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated numbers of users to measure at, e.g. 1000,10000,100000,1000000.')
+        parser.add_argument('--repeat', type=int, default=200, help='Signups measured per size.')
+        parser.add_argument('--legacy-max', type=int, default=100000,
+                            help='Largest size the checks loading every user are measured at.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with scratch_database():
+            self.stdout.write(f'{"users":>9} {"filter ms":>10} {"free us":>9} {"taken us":>9} '
+                              f'{"signup ms":>10} {"legacy ms":>10}  (medians)')
+            count, attempt = 0, 0
+            for size in sizes:
+                count = self.populate(count, size)
+                results = {}
+                with timer(results, 'filter'):
+                    build_account_filter()
+                free = self.measure(lambda i: email_taken(f'free{i}@example.com') or username_taken(f'free{i}'),
+                                    options['repeat'])
+                taken = self.measure(lambda i: self.taken_checks(f'User{i * 7919 % size}'), options['repeat'])
+                signup = self.measure(lambda i: self.signup(f'new{attempt + i}'), options['repeat'])
+                attempt += options['repeat']
+                legacy = self.measure(lambda i: self.legacy_checks(f'free{i}'), 5) \
+                    if size <= options['legacy_max'] else None
+                self.stdout.write(f'{size:9} {results["filter"] * 1000:10.1f} {free * 1e6:9.1f} {taken * 1e6:9.1f} '
+                                  f'{signup * 1000:10.2f} ' + (f'{legacy * 1000:10.1f}' if legacy is not None else f'{"-":>10}'))
+
+    @staticmethod
+    def populate(count, size, batch_size=10000):
+        while count < size:
+            batch = range(count, min(size, count + batch_size))
+            # unusable passwords, hashing would dominate the setup
+            User.objects.bulk_create([User(username=f'user{i}', email=f'user{i}@example.com', password='!')
+                                      for i in batch])
+            count = batch.stop
+        return count
+
+    @staticmethod
+    def taken_checks(username):
+        # existing accounts, in another case
+        assert email_taken(f'{username}@example.com') and username_taken(username)
+
+    @staticmethod
+    def signup(username):
+        # SignUpView.form_valid without the password hashing and the profile
+        email = f'{username}@example.com'
+        assert not email_taken(email) and not username_taken(username)
+        with transaction.atomic():
+            user = User(username=username, email=email)
+            user.set_unusable_password()
+            user.save()
+
+    @staticmethod
+    def legacy_checks(username):
+        # the checks signup made before, materializing the user table twice
+        return f'{username}@example.com' in [user.email for user in User.objects.all()] or \
+            username in [user.username for user in User.objects.all()]
+
+    @staticmethod
+    def measure(function, repeat):
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            function(i)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from home.management.benchmark import scratch_database, timer
+from home.models import Message, Post, Profile
+from home.preload import preload_templates, reset_templates
+
+
+class Command(BaseCommand):
+    help = 'Measure the time to serve the main pages with templates parsed per request and preloaded.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Number of users, all friends of the viewer.')
+        parser.add_argument('--posts', type=int, default=5, help='Posts per user.')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per page and mode.')
+
+    def handle(self, *args, **options):
+        # no cached pages or fragments, every request renders its templates in full.
+        # Sessions fall through to the database.
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with scratch_database(), override_settings(
+                CACHES={'default': dummy, 'sessions': dummy},
+                ALLOWED_HOSTS=['testserver']):
+            viewer, other, post, message = self.populate(options['users'], options['posts'])
+            client = Client()
+            client.force_login(viewer)
+            pages = {
+                'home': reverse('index'),
+                'profile': reverse('userprofile', args=[viewer.username]),
+                'friend profile': reverse('userprofile', args=[other.username]),
+                'post': reverse('post_detail', args=[post.id]),
+                'search': reverse('search') + '?q=bench',
+                'friends': reverse('friends'),
+                'messages': reverse('messages'),
+                'conversation': reverse('message_detail', args=[message.id]),
+            }
+            results = {}
+            with timer(results, 'preload'):
+                loaded, _ = preload_templates()
+            self.stdout.write(f'Preloaded {loaded} template(s) in {results["preload"] * 1000:.1f} ms')
+            self.stdout.write(f'{"page":>16} {"parsed":>10} {"preloaded":>10}  (median ms per request)')
+            for name, url in pages.items():
+                parsed = self.measure(client, url, options['repeat'], reset=True)
+                preloaded = self.measure(client, url, options['repeat'], reset=False)
+                self.stdout.write(f'{name:>16} {parsed:10.2f} {preloaded:10.2f}')
+
+    @staticmethod
+    def populate(users, posts):
+        people = User.objects.bulk_create([User(username=f'bench{i}', first_name='Bench', last_name=str(i),
+                                                email=f'bench{i}@example.com', password='!')
+                                           for i in range(users)])
+        Profile.objects.bulk_create([Profile(user=user, profile_pic='bench.png', cover_pic='bench.svg')
+                                     for user in people])
+        viewer, other = people[0], people[1]
+        viewer.profile.friends.add(*[user.profile for user in people[1:]])
+        for user in people:
+            for i in range(posts):
+                Post(user=user, content=f'bench post {i} by {user.username}').save()
+        message = Message.objects.create(sender=viewer, receiver=other)
+        for i in range(30):
+            message.add_content(viewer if i % 2 else other, f'bench message {i}')
+        return viewer, other, Post.objects.filter(user=other).first(), message
+
+    @staticmethod
+    def measure(client, url, repeat, reset):
+        timings = []
+        for _ in range(repeat):
+            if reset:
+                reset_templates()
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, (url, response.status_code)
+        return statistics.median(timings) * 1000
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home.images import get_image_fields, get_variants_field, run_background_job
+
+
+class Command(BaseCommand):
+    help = 'Build the missing resized variants of uploaded images, as listed in IMAGE_VARIANTS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every variant, not only the missing ones.')
+        parser.add_argument('--workers', type=int, default=max(1, getattr(settings, 'IMAGE_WORKERS', 2)),
+                            help='Number of threads building variants.')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model in apps.get_app_config('home').get_models():
+            for field_name in get_image_fields(model):
+                rows = model.objects.exclude(**{field_name: ''}).values_list(
+                    'pk', field_name, get_variants_field(field_name))
+                jobs.extend((model._meta.label, pk, field_name, name)
+                            for pk, name, variants in rows.iterator()
+                            if options['all'] or variants.get('source') != name)
+        failed = 0
+        with ThreadPoolExecutor(options['workers'], thread_name_prefix='image-variants') as executor:
+            futures = {executor.submit(run_background_job, *job): job for job in jobs}
+            for future, (label, pk, field_name, name) in futures.items():
+                try:
+                    future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{label} {pk} {field_name} ({name}): {error}')
+        self.stdout.write(self.style.SUCCESS(f'Built the variants of {len(jobs) - failed} image(s).'))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from home.models import Blob
+
+
+class Command(BaseCommand):
+    help = 'Delete the stored blobs no row points at anymore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=24,
+                            help='Hours a blob is kept after it was stored, so uploads in progress keep theirs.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+        deleted = 0
+        for blob in Blob.objects.filter(ref_count=0, created_at__lt=cutoff).iterator():
+            # a reference taken since the query keeps it
+            if Blob.objects.filter(pk=blob.pk, ref_count=0).delete()[0]:
+                blob.file.storage.delete(blob.file.name)
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} blob(s).'))
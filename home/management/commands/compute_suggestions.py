@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home.models import Profile
+from home.suggestions import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Precompute "people you may know" from mutual friend counts for users whose friend graph changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute every user, not only the stale ones.')
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes.')
+        parser.add_argument('--top', type=int, default=getattr(settings, 'FRIEND_SUGGESTIONS_COUNT', 10),
+                            help='Number of suggestions kept per user.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users scored per worker task.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Stale users whose part of the graph is loaded and scored at a time.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            Profile.objects.update(suggestions_stale=False)
+            try:
+                count = compute_suggestions(None, options['top'], options['processes'], options['chunk_size'])
+            except BaseException:
+                Profile.objects.update(suggestions_stale=True)
+                raise
+        else:
+            count = self.compute_stale(options)
+            if not count:
+                self.stdout.write('No stale suggestions.')
+                return
+        self.stdout.write(self.style.SUCCESS(f'Computed suggestions for {count} user(s).'))
+
+    @staticmethod
+    def compute_stale(options):
+        # batch_size stale users at a time in id order, each batch loads only
+        # its part of the graph and the queries stay bounded
+        count, last_id = 0, 0
+        while True:
+            profile_ids = list(Profile.objects.filter(suggestions_stale=True, id__gt=last_id).order_by('id')
+                               .values_list('id', flat=True)[:options['batch_size']])
+            if not profile_ids:
+                return count
+            last_id = profile_ids[-1]
+            batch = Profile.objects.filter(id__in=profile_ids)
+            # cleared first: edges changing while we compute mark the users stale again
+            batch.update(suggestions_stale=False)
+            try:
+                count += compute_suggestions(profile_ids, options['top'], options['processes'],
+                                             options['chunk_size'])
+            except BaseException:
+                batch.update(suggestions_stale=True)
+                raise
@@ -0,0 +1,34 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home.blobs import is_blob, set_blob, store
+from home.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Move the profile photos stored per user into the shared blob store, deleting the copies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-files', action='store_true', help="Don't delete the per-user copies.")
+
+    def handle(self, *args, **options):
+        moved = freed = 0
+        for profile in Profile.objects.all().iterator():
+            for field_name in ['profile_pic', 'cover_pic']:
+                file = getattr(profile, field_name)
+                if not file or is_blob(file.name):
+                    continue
+                old_name = file.name
+                try:
+                    with file.storage.open(old_name) as content, transaction.atomic():
+                        set_blob(profile, field_name, store(File(content), old_name))
+                        profile.save(update_fields=[field_name])
+                except FileNotFoundError:
+                    self.stderr.write(f'{profile}: {old_name} is missing')
+                    continue
+                moved += 1
+                if not options['keep_files']:
+                    freed += file.storage.size(old_name)
+                    file.storage.delete(old_name)
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} photo(s) to blobs, freed {freed} bytes.'))
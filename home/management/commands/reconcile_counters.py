@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from home.models import Comment, Post, Reaction, count_subquery
+
+
+class Command(BaseCommand):
+    help = 'Recompute the like, dislike and comment counters of posts that drifted from the real counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of posts updated per query.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        drifted = Post.objects.annotate(
+            real_likes=count_subquery(Reaction.objects.filter(kind='like'), 'post'),
+            real_dislikes=count_subquery(Reaction.objects.filter(kind='dislike'), 'post'),
+            real_comments=count_subquery(Comment.objects, 'post'),
+        ).filter(
+            ~Q(like_count=F('real_likes')) | ~Q(dislike_count=F('real_dislikes')) | ~Q(comment_count=F('real_comments'))
+        ).only('id', 'like_count', 'dislike_count', 'comment_count')
+        fixed = 0
+        batch = []
+        for post in drifted.iterator(chunk_size=batch_size):
+            post.like_count = post.real_likes
+            post.dislike_count = post.real_dislikes
+            post.comment_count = post.real_comments
+            batch.append(post)
+            if len(batch) >= batch_size:
+                fixed += self.save(batch)
+                batch = []
+        fixed += self.save(batch)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {fixed} post(s).'))
+
+    @staticmethod
+    def save(posts):
+        # only touch the counters so concurrent edits to the posts are kept
+        Post.objects.bulk_update(posts, ['like_count', 'dislike_count', 'comment_count'])
+        return len(posts)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home.preload import preload_templates
+
+
+class Command(BaseCommand):
+    help = ('Compile every project template to check it is valid. Workers do the same at startup '
+            'when PRELOAD_TEMPLATES is set.')
+
+    def handle(self, *args, **options):
+        loaded, errors = preload_templates()
+        for name, error in errors.items():
+            self.stderr.write(f'{name}: {error}')
+        if errors:
+            raise CommandError(f'{len(errors)} invalid template(s).')
+        self.stdout.write(self.style.SUCCESS(f'Compiled {loaded} template(s).'))
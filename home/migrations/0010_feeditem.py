@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_feeds(apps, schema_editor):
+    Post = apps.get_model('home', 'Post')
+    Profile = apps.get_model('home', 'Profile')
+    FeedItem = apps.get_model('home', 'FeedItem')
+    friends = {}
+    for profile in Profile.objects.prefetch_related('friends'):
+        friends[profile.user_id] = [friend.user_id for friend in profile.friends.all()]
+    items = []
+    for post in Post.objects.only('id', 'user_id', 'created_at').iterator():
+        for user_id in [post.user_id] + friends.get(post.user_id, []):
+            items.append(FeedItem(user_id=user_id, post_id=post.id, created_at=post.created_at))
+    FeedItem.objects.bulk_create(items, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_messagecontent_from_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-created_at'], name='home_post_user_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='feeditem',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='home.post'),
+        ),
+        migrations.AddField(
+            model_name='feeditem',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-created_at', '-post'], name='home_feeditem_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='home_feeditem_user_post_uniq'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
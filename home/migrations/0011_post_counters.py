@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('home', 'Post')
+    Comment = apps.get_model('home', 'Comment')
+
+    def count(queryset):
+        counts = queryset.filter(post=OuterRef('pk')).values('post').annotate(total=Count('*')).values('total')
+        return Coalesce(Subquery(counts), 0)
+
+    Post.objects.update(like_count=count(Post.likes.through.objects),
+                        dislike_count=count(Post.dislikes.through.objects),
+                        comment_count=count(Comment.objects))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_feeditem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
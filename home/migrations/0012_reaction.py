@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def copy_reactions(apps, schema_editor):
+    Post = apps.get_model('home', 'Post')
+    Reaction = apps.get_model('home', 'Reaction')
+    reactions = {}
+    # a like wins over a dislike left behind by the same user
+    for kind, through in [('dislike', Post.dislikes.through), ('like', Post.likes.through)]:
+        for post_id, user_id in through.objects.values_list('post_id', 'user_id').iterator():
+            reactions[post_id, user_id] = kind
+    Reaction.objects.bulk_create([Reaction(post_id=post_id, user_id=user_id, kind=kind)
+                                  for (post_id, user_id), kind in reactions.items()], batch_size=500)
+
+    def count(kind):
+        counts = Reaction.objects.filter(post=OuterRef('pk'), kind=kind).values('post').annotate(
+            total=Count('*')).values('total')
+        return Coalesce(Subquery(counts), 0)
+
+    Post.objects.update(like_count=count('like'), dislike_count=count('dislike'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_post_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='home.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['post', 'kind'], name='home_reaction_post_kind_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'post'), name='home_reaction_user_post_uniq')],
+            },
+        ),
+        migrations.RunPython(copy_reactions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='post',
+            name='dislikes',
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='likes',
+        ),
+    ]
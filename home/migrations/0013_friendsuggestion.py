@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0012_reaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='suggestions_stale',
+            field=models.BooleanField(db_index=True, default=True, editable=False),
+        ),
+        migrations.CreateModel(
+            name='FriendSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mutual_count', models.PositiveIntegerField()),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.profile')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to='home.profile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile', '-mutual_count'], name='home_suggestion_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('profile', 'candidate'), name='home_suggestion_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_index(apps, schema_editor):
+    # SQLite only: other databases keep the ORM fallback of home.search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    User = apps.get_model('auth', 'User')
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE home_usersearch USING fts5(username, full_name, tokenize='trigram')")
+        except OperationalError:
+            # SQLite built without FTS5 or older than 3.34
+            return
+        users = User.objects.values_list('id', 'username', 'first_name', 'last_name')
+        cursor.executemany('INSERT INTO home_usersearch (rowid, username, full_name) VALUES (%s, %s, %s)',
+                           [(pk, username, f'{first_name} {last_name}'.strip())
+                            for pk, username, first_name, last_name in users.iterator()])
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS home_usersearch')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('home', '0013_friendsuggestion'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
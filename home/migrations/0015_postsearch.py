@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+TRIGGERS = [
+    """CREATE TRIGGER home_post_search_insert AFTER INSERT ON home_post BEGIN
+        INSERT INTO home_postsearch (rowid, body, post_id) VALUES (new.id * 2, new.content, new.id);
+    END""",
+    """CREATE TRIGGER home_post_search_update AFTER UPDATE OF content ON home_post BEGIN
+        UPDATE home_postsearch SET body = new.content WHERE rowid = new.id * 2;
+    END""",
+    """CREATE TRIGGER home_post_search_delete AFTER DELETE ON home_post BEGIN
+        DELETE FROM home_postsearch WHERE rowid = old.id * 2;
+    END""",
+    """CREATE TRIGGER home_comment_search_insert AFTER INSERT ON home_comment BEGIN
+        INSERT INTO home_postsearch (rowid, body, post_id) VALUES (new.id * 2 + 1, new.content, new.post_id);
+    END""",
+    """CREATE TRIGGER home_comment_search_update AFTER UPDATE OF content ON home_comment BEGIN
+        UPDATE home_postsearch SET body = new.content WHERE rowid = new.id * 2 + 1;
+    END""",
+    """CREATE TRIGGER home_comment_search_delete AFTER DELETE ON home_comment BEGIN
+        DELETE FROM home_postsearch WHERE rowid = old.id * 2 + 1;
+    END""",
+]
+
+
+def create_index(apps, schema_editor):
+    # SQLite only: other databases have no post search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE home_postsearch USING fts5(body, post_id UNINDEXED, "
+                           "tokenize='porter unicode61 remove_diacritics 2')")
+        except OperationalError:
+            # SQLite built without FTS5
+            return
+        cursor.execute('INSERT INTO home_postsearch (rowid, body, post_id) SELECT id * 2, content, id FROM home_post')
+        cursor.execute('INSERT INTO home_postsearch (rowid, body, post_id) '
+                       'SELECT id * 2 + 1, content, post_id FROM home_comment')
+        for trigger in TRIGGERS:
+            cursor.execute(trigger)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for name in ['post', 'comment']:
+            for event in ['insert', 'update', 'delete']:
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS home_{name}_search_{event}')
+        schema_editor.execute('DROP TABLE IF EXISTS home_postsearch')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0014_usersearch'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
+
+
+def fill_summaries(apps, schema_editor):
+    Message = apps.get_model('home', 'Message')
+    MessageContent = apps.get_model('home', 'MessageContent')
+    latest = MessageContent.objects.filter(message=OuterRef('pk')).order_by('-created_at', '-id')
+
+    def unread(from_user):
+        contents = MessageContent.objects.filter(message=OuterRef('pk'), from_user=from_user, is_read=False)
+        return Coalesce(Subquery(contents.values('message').annotate(count=Count('id')).values('count')), 0)
+
+    Message.objects.update(
+        last_content=Subquery(latest.values('id')[:1]),
+        last_snippet=Coalesce(Substr(Subquery(latest.values('content')[:1]), 1, 200), models.Value('')),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        sender_unread=unread('receiver'),
+        receiver_unread=unread('sender'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0015_postsearch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='last_content',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='home.messagecontent'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='last_snippet',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='receiver_unread',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='sender_unread',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', '-updated_at'], name='home_message_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', '-updated_at'], name='home_message_receiver_idx'),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0016_message_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='messagecontent',
+            index=models.Index(fields=['message', 'created_at', 'id'], name='home_msgcontent_history_idx'),
+        ),
+    ]
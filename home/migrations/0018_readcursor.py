@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def create_cursors(apps, schema_editor):
+    # a participant has read up to the first message they received unread
+    Message = apps.get_model('home', 'Message')
+    MessageContent = apps.get_model('home', 'MessageContent')
+    ReadCursor = apps.get_model('home', 'ReadCursor')
+    cursors = []
+    for message in Message.objects.exclude(last_content=None).iterator():
+        contents = MessageContent.objects.filter(message=message)
+        for user_id, role in [(message.sender_id, 'sender'), (message.receiver_id, 'receiver')]:
+            first_unread = contents.filter(is_read=False).exclude(from_user=role).aggregate(id=Min('id'))['id']
+            last_read = first_unread - 1 if first_unread else contents.aggregate(id=Max('id'))['id']
+            if last_read:
+                cursors.append(ReadCursor(message_id=message.id, user_id=user_id, last_read=last_read))
+    ReadCursor.objects.bulk_create(cursors, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0017_messagecontent_history_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='home.message')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('message', 'user'), name='home_readcursor_uniq')],
+            },
+        ),
+        migrations.RunPython(create_cursors, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='receiver_unread',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='sender_unread',
+        ),
+        migrations.RemoveField(
+            model_name='messagecontent',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+def recreate_search_triggers(apps, schema_editor):
+    # SQLite rebuilds home_post to add the column, which drops the triggers
+    # keeping the post search index in sync (see 0015_postsearch)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if 'home_postsearch' not in schema_editor.connection.introspection.table_names():
+        return
+    postsearch = import_module('home.migrations.0015_postsearch')
+    for trigger in postsearch.TRIGGERS:
+        name = trigger.split()[2]
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        schema_editor.execute(trigger)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0018_readcursor'),
+    ]
+
+    operations = [
+        # first so that unapplying the migration restores the triggers too
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='attachment_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='cover_pic_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profile_pic_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:03
+
+from django.db import IntegrityError, migrations, transaction
+
+# name, indexed expression, rows covered: users created without an email
+# (createsuperuser) don't collide with each other. Queries repeat the condition
+# for the partial index to be used (see home.accounts).
+INDEXES = [
+    ('home_user_email_lower_uniq', 'LOWER("email")', "\"email\" > ''"),
+    ('home_user_username_lower_uniq', 'LOWER("username")', None),
+]
+
+
+def create_indexes(apps, schema_editor):
+    for name, expression, condition in INDEXES:
+        sql = f'INDEX {name} ON auth_user ({expression})' + (f' WHERE {condition}' if condition else '')
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                schema_editor.execute(f'CREATE UNIQUE {sql}')
+        except IntegrityError:
+            # existing accounts differing only by case, the lookups are still indexed
+            # and the signup checks keep new ones from being added
+            schema_editor.execute(f'CREATE {sql}')
+
+
+def drop_indexes(apps, schema_editor):
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('home', '0020_blob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
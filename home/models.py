@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 import uuid
 
+from . import badges, blobs, images
+from .cache import bump_versions, cached
+
 
 def get_pp_path(instance, filename):
     return f'user_{instance.user.username}_{instance.user.id}/pp/{filename}'
@@ -18,11 +24,34 @@ def get_post_path(instance, filename):
     return f'user_{instance.user.username}/{instance.id}/{filename}'
 
 
+class Blob(models.Model):
+    """
+    A file stored once under the SHA-256 of its content and shared by the rows
+    pointing at it. ref_count is the number of these rows, the collect_blobs
+    command deletes the blobs nothing points at anymore.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=200)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.file.name
+
+
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    # photos
+    # photos, uploads are stored as blobs the photo fields point to
     profile_pic = models.ImageField(upload_to=get_pp_path, blank=True)
     cover_pic = models.ImageField(upload_to=get_cp_path, blank=True)
+    profile_pic_blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                                         related_name='+')
+    cover_pic_blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                                       related_name='+')
+    # resized copies of the photos, see IMAGE_VARIANTS
+    profile_pic_variants = models.JSONField(default=dict, blank=True, editable=False)
+    cover_pic_variants = models.JSONField(default=dict, blank=True, editable=False)
     # basic info
     GENDER_CHOICES = [('Male', 'Male'), ('Female', 'Female')]
     gender = models.CharField(choices=GENDER_CHOICES, default='Male', max_length=10)
@@ -49,6 +78,12 @@ class Profile(models.Model):
     duration_current = models.BooleanField(default=False)
     # friends
     friends = models.ManyToManyField('Profile', blank=True, symmetrical=True)
+    # set once the user has too many friends to fan their posts out on write,
+    # their friends then pull these posts when reading the newsfeed
+    fanout_on_read = models.BooleanField(default=False, editable=False)
+    # set when the friend graph around the user changed since the last
+    # compute_suggestions run
+    suggestions_stale = models.BooleanField(default=True, editable=False, db_index=True)
 
     def __str__(self):
         return self.user.username
@@ -56,46 +91,151 @@ class Profile(models.Model):
     def get_absolute_url(self):
         return reverse('profile', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        photos = ['profile_pic', 'cover_pic']
+        if kwargs.get('update_fields') is not None:
+            photos = [name for name in photos if name in kwargs['update_fields']]
+            kwargs['update_fields'] = [*kwargs['update_fields'], *[f'{name}_blob' for name in photos]]
+        with transaction.atomic():
+            blobs.attach(self, photos)
+            changed = images.reset_variants(self, kwargs.get('update_fields'))
+            kwargs['update_fields'] = images.get_update_fields(kwargs.get('update_fields'), changed)
+            super().save(*args, **kwargs)
+        images.schedule_variants(self, changed)
+
     def get_full_name(self):
-        return User.objects.get(pk=self.user.pk).get_full_name()
+        return self.user.get_full_name()
 
     def get_friends(self):
         return self.friends.all()
 
+    def get_friend_ids(self):
+        """
+        Get the user ids of the user's friends, loaded once per instance and kept
+        in the shared cache until the friendship changes.
+        """
+        if not hasattr(self, '_friend_ids'):
+            self._friend_ids = cached('friend_ids', [('friends', self.user_id)],
+                                      lambda: frozenset(self.friends.values_list('user_id', flat=True)),
+                                      getattr(settings, 'FRIENDS_CACHE_TIMEOUT', 300))
+        return self._friend_ids
+
+    def is_friend(self, user):
+        return user.id in self.get_friend_ids()
+
+    def forget_friends(self):
+        # the cached set is invalidated by the m2m_changed signal
+        self.__dict__.pop('_friend_ids', None)
+
+    def mark_suggestions_stale(self, friend):
+        # the mutual friend counts of both users and of all their friends change
+        profiles = [self.pk, friend.pk]
+        Profile.objects.filter(Q(pk__in=profiles) | Q(friends__in=profiles)).update(suggestions_stale=True)
+
+    def get_suggestions(self):
+        """
+        Get the precomputed "people you may know", skipping users befriended since.
+        """
+        count = getattr(settings, 'FRIEND_SUGGESTIONS_COUNT', 10)
+        suggestions = self.suggestions.select_related('candidate__user').order_by('-mutual_count', 'candidate')
+        return [suggestion for suggestion in suggestions[:count]
+                if not self.is_friend(suggestion.candidate.user)]
+
+    def add_friend(self, friend):
+        self.friends.add(friend)
+        self.forget_friends()
+        friend.forget_friends()
+        self.mark_suggestions_stale(friend)
+        FeedItem.backfill(self.user, friend.user)
+        FeedItem.backfill(friend.user, self.user)
+
     def remove_friend(self, friend):
         self.friends.remove(friend)
+        self.forget_friends()
+        friend.forget_friends()
+        self.mark_suggestions_stale(friend)
+        FeedItem.prune(self.user, friend.user)
 
     def get_friends_count(self):
-        return self.friends.count()
+        return len(self.get_friend_ids())
 
     def get_friends_request_count(self):
-        return FriendRequests.objects.filter(receiver_user=self.user).count()
+        return badges.get_badges(self.user)['friend_requests']
 
     def get_friends_list(self):
-        return self.friends.all().values_list('username', flat=True)
+        return User.objects.filter(id__in=self.get_friend_ids()).values_list('username', flat=True)
 
     def get_post_count(self):
-        return Post.objects.filter(user=self.user).count()
-
-    def get_newsfeed(self):
-        # combine user's posts and friends' posts into one queryset
-        user_posts = Post.objects.filter(user=self.user)
-        friends_posts = Post.objects.filter(user__profile__in=self.friends.all())
-        result = user_posts | friends_posts
-        return result.order_by('-created_at')
+        return cached('post_count', [('posts', self.user_id)], Post.objects.filter(user=self.user_id).count)
+
+    def get_pulled_ids(self):
+        """
+        Get the user ids of the friends whose posts are pulled into the newsfeed
+        when it is read (see FeedItem.fan_out).
+        """
+        return cached('pulled_ids', [('friends', self.user_id)],
+                      lambda: list(self.friends.filter(fanout_on_read=True).values_list('user_id', flat=True)))
+
+    def get_newsfeed(self, before=None):
+        """
+        Get the user's newsfeed, newest first. before is an optional
+        (created_at, post id) keyset: only posts older than it are returned.
+        """
+        # posts fanned out to the user's feed when they were created
+        pulled = self.get_pulled_ids()
+        if not pulled:
+            query = Q(feeditem__user=self.user)
+            if before is not None:
+                # the range bound lets the index seek, it can't through the OR
+                query &= Q(feeditem__created_at__lte=before[0]) & (
+                    Q(feeditem__created_at__lt=before[0]) |
+                    Q(feeditem__created_at=before[0], feeditem__post_id__lt=before[1]))
+            return Post.objects.filter(query).order_by('-feeditem__created_at', '-feeditem__post_id')
+        # merge in the posts of friends that are read on demand
+        inbox = FeedItem.objects.filter(user=self.user)
+        if before is not None:
+            inbox = inbox.filter(created_at__lte=before[0])
+        posts = Post.objects.filter(Q(id__in=inbox.values('post_id')) | Q(user__in=pulled))
+        if before is not None:
+            posts = posts.filter(Q(created_at__lt=before[0]) | Q(created_at=before[0], id__lt=before[1]),
+                                 created_at__lte=before[0])
+        return posts.order_by('-created_at', '-id')
 
     def get_public_post_count(self):
-        return Post.objects.filter(user=self.user, visibility__iexact='public').count()
+        return cached('public_post_count', [('posts', self.user_id)],
+                      Post.objects.filter(user=self.user_id, visibility__iexact='public').count)
 
     def send_friend_request(self, receiver):
         FriendRequests.objects.create(sender_user=self.user, receiver_user=receiver)
+        badges.forget(badges.FRIEND_REQUESTS, receiver.id)
 
     def revoke_friend_request(self, receiver):
-        FriendRequests.objects.filter(sender_user=self.user, receiver_user=receiver).delete()
+        deleted, _ = FriendRequests.objects.filter(sender_user=self.user, receiver_user=receiver).delete()
+        if deleted:
+            badges.forget(badges.FRIEND_REQUESTS, receiver.id)
 
     def accept_friend_request(self, sender):
-        FriendRequests.objects.filter(sender_user=sender, receiver_user=self.user).delete()
-        self.friends.add(sender.profile)
+        deleted, _ = FriendRequests.objects.filter(sender_user=sender, receiver_user=self.user).delete()
+        if deleted:
+            badges.forget(badges.FRIEND_REQUESTS, self.user.id)
+        self.add_friend(sender.profile)
+
+
+class FriendSuggestion(models.Model):
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='suggestions')
+    candidate = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='+')
+    mutual_count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'candidate'], name='home_suggestion_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['profile', '-mutual_count'], name='home_suggestion_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.candidate} for {self.profile} ({self.mutual_count} mutual)'
 
 
 class FriendRequests(models.Model):
@@ -108,13 +248,36 @@ class FriendRequests(models.Model):
         return f'{self.sender_user.username} sent a friend request to {self.receiver_user.username}'
 
     def accept(self):
-        self.sender_user.profile.friends.add(self.receiver_user.profile)
-        self.receiver_user.profile.friends.add(self.sender_user.profile)
+        self.sender_user.profile.add_friend(self.receiver_user.profile)
         self.delete()
 
     def reject(self):
         self.delete()
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        badges.forget(badges.FRIEND_REQUESTS, self.receiver_user_id)
+        return result
+
+
+def count_subquery(queryset, field):
+    # correlated COUNT(*) of the rows in queryset pointing at the outer row
+    counts = queryset.filter(**{field: OuterRef('pk')}).values(field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+class PostQuerySet(models.QuerySet):
+    def with_details(self, viewer):
+        """
+        Load what a post card renders in the same query: the author and their
+        profile and the viewer's own reaction.
+        """
+        reactions = Reaction.objects.filter(post=OuterRef('pk'), user=viewer.pk)
+        return self.select_related('user', 'user__profile').annotate(
+            viewer_liked=Exists(reactions.filter(kind='like')),
+            viewer_disliked=Exists(reactions.filter(kind='dislike')),
+        )
+
 
 class Post(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -122,12 +285,23 @@ class Post(models.Model):
     post_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     content = models.TextField()
     attachment = models.FileField(upload_to=get_post_path, blank=True)
+    # resized copies of an image attachment, see IMAGE_VARIANTS
+    attachment_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    likes = models.ManyToManyField(User, related_name='likes', blank=True)
-    dislikes = models.ManyToManyField(User, related_name='dislikes', blank=True)
     VIEWS_CHOICES = [('public', 'Public'), ('friends', 'Friends')]
     visibility = models.CharField(max_length=10, default='public', choices=VIEWS_CHOICES)
+    # denormalized counters, kept in sync by Reaction.toggle and Comment
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    dislike_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='home_post_user_created_idx'),
+        ]
 
     def __str__(self):
         return self.slug
@@ -136,21 +310,150 @@ class Post(models.Model):
         return reverse('post_detail', kwargs={'pk': self.id})
 
     def save(self, *args, **kwargs):
+        is_new = self._state.adding
         self.post_id = uuid.uuid4()
         self.slug = slugify(self.user.username + '-' + str(self.post_id))
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            changed = images.reset_variants(self, kwargs.get('update_fields'))
+            kwargs['update_fields'] = images.get_update_fields(kwargs.get('update_fields'), changed)
+            super().save(*args, **kwargs)
+        images.schedule_variants(self, changed)
+        if is_new:
+            FeedItem.fan_out(self)
 
     def get_comments(self):
-        return self.comment_set.all()
+        return self.comment_set.select_related('user', 'user__profile')
 
     def get_comment_count(self):
-        return self.comment_set.count()
+        return self.comment_count
 
     def get_like_count(self):
-        return self.likes.count()
+        return self.like_count
 
     def get_dislike_count(self):
-        return self.dislikes.count()
+        return self.dislike_count
+
+    def update_counters(self, **deltas):
+        """
+        Atomically add the given deltas to the post's counter columns.
+        """
+        Post.objects.filter(pk=self.pk).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+class Reaction(models.Model):
+    KIND_CHOICES = [('like', 'Like'), ('dislike', 'Dislike')]
+    COUNTERS = {'like': 'like_count', 'dislike': 'dislike_count'}
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='home_reaction_user_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['post', 'kind'], name='home_reaction_post_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} {self.kind}s {self.post}'
+
+    @classmethod
+    def toggle(cls, user, post_id, kind):
+        """
+        Toggle the user's reaction to a post in a single transaction: the same kind
+        removes it, the other kind switches it. Returns the user's new reaction
+        (None if removed) and the post's like and dislike counts.
+        """
+        counter = cls.COUNTERS[kind]
+        with transaction.atomic():
+            reactions = cls.objects.filter(user=user, post_id=post_id)
+            if reactions.filter(kind=kind).delete()[0]:
+                reaction, deltas = None, {counter: -1}
+            elif reactions.update(kind=kind):
+                other = cls.COUNTERS['dislike' if kind == 'like' else 'like']
+                reaction, deltas = kind, {counter: 1, other: -1}
+            else:
+                cls.objects.create(user=user, post_id=post_id, kind=kind)
+                reaction, deltas = kind, {counter: 1}
+            post = Post.objects.filter(pk=post_id)
+            if not post.update(**{field: F(field) + delta for field, delta in deltas.items()}):
+                raise Post.DoesNotExist('Post matching query does not exist.')
+            like_count, dislike_count, author_id = post.values_list('like_count', 'dislike_count', 'user_id').get()
+            bump_versions(('post', post_id), ('posts', author_id), ('viewer', user.pk))
+            FeedItem.bump_readers(post_id)
+        return reaction, like_count, dislike_count
+
+
+class FeedItem(models.Model):
+    """
+    A post delivered to a user's newsfeed. created_at mirrors the post's so the
+    feed can be read straight off the (user, created_at, post) index.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='home_feeditem_user_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='home_feeditem_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} in {self.user.username}\'s feed'
+
+    @classmethod
+    def fan_out(cls, post):
+        """
+        Deliver a new post to its author's and their friends' feeds. Authors with
+        more friends than NEWSFEED_FANOUT_LIMIT are switched to fan-out on read.
+        """
+        limit = getattr(settings, 'NEWSFEED_FANOUT_LIMIT', 1000)
+        recipients = [post.user_id]
+        profile = Profile.objects.filter(user=post.user).first()
+        if profile is not None and not profile.fanout_on_read:
+            friends = list(profile.friends.values_list('user_id', flat=True)[:limit + 1])
+            if len(friends) > limit:
+                Profile.objects.filter(pk=profile.pk).update(fanout_on_read=True)
+                # once per author: their friends' newsfeeds pull the posts from now on
+                bump_versions(*[('friends', user_id) for user_id in profile.friends.values_list('user_id', flat=True)])
+            else:
+                recipients += friends
+        cls.objects.bulk_create([cls(user_id=user_id, post=post, created_at=post.created_at)
+                                 for user_id in recipients], ignore_conflicts=True)
+        bump_versions(*[('feed', user_id) for user_id in recipients])
+
+    @classmethod
+    def bump_readers(cls, *post_ids):
+        """
+        Invalidate the cached newsfeeds the posts were delivered to, after a
+        change to the posts, their counters or comments.
+        """
+        readers = cls.objects.filter(post_id__in=post_ids).values_list('user_id', flat=True).distinct()
+        bump_versions(*[('feed', user_id) for user_id in readers])
+
+    @classmethod
+    def backfill(cls, user, author):
+        """
+        Copy the latest posts of a new friend into the user's feed.
+        """
+        if Profile.objects.filter(user=author, fanout_on_read=True).exists():
+            return
+        size = getattr(settings, 'NEWSFEED_BACKFILL_SIZE', 50)
+        posts = Post.objects.filter(user=author).order_by('-created_at').values_list('id', 'created_at')[:size]
+        cls.objects.bulk_create([cls(user=user, post_id=post_id, created_at=created_at)
+                                 for post_id, created_at in posts], ignore_conflicts=True)
+
+    @classmethod
+    def prune(cls, user, author):
+        """
+        Remove the posts of a former friend from the user's feed and vice versa.
+        """
+        cls.objects.filter(Q(user=user, post__user=author) | Q(user=author, post__user=user)).delete()
 
 
 class Comment(models.Model):
@@ -168,8 +471,39 @@ class Comment(models.Model):
         return reverse('comment', kwargs={'pk': self.post.pk})
 
     def save(self, *args, **kwargs):
+        is_new = self._state.adding
         self.slug = slugify(self.user.username + '-' + str(uuid.uuid4()))
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                self.post.update_counters(comment_count=1)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self.post.update_counters(comment_count=-1)
+            return super().delete(*args, **kwargs)
+
+
+class MessageQuerySet(models.QuerySet):
+    def with_read_state(self, viewer):
+        """
+        Annotate each conversation with the viewer's read cursor, the other
+        participant's one and the viewer's number of unread messages.
+        """
+        cursors = ReadCursor.objects.filter(message=OuterRef('pk'))
+        unread = MessageContent.objects.filter(id__gt=OuterRef('viewer_last_read'))
+        return self.annotate(
+            viewer_last_read=Coalesce(Subquery(cursors.filter(user=viewer.pk).values('last_read')), 0),
+            other_last_read=Coalesce(Subquery(cursors.exclude(user=viewer.pk).values('last_read')[:1]), 0),
+        ).annotate(unread_count=count_subquery(unread, 'message'))
+
+    def unread_by(self, user):
+        """
+        Filter the conversations whose latest message is past the user's read cursor.
+        """
+        cursors = ReadCursor.objects.filter(message=OuterRef('pk'), user=user.pk).values('last_read')
+        return self.exclude(last_content=None).annotate(user_last_read=Coalesce(Subquery(cursors), 0)).filter(
+            last_content_id__gt=F('user_last_read'))
 
 
 class Message(models.Model):
@@ -177,6 +511,21 @@ class Message(models.Model):
     receiver = models.ForeignKey(User, related_name='receiver', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # conversation summary for the inbox, kept in sync by add_content
+    last_content = models.ForeignKey('MessageContent', null=True, blank=True, related_name='+',
+                                     on_delete=models.SET_NULL, editable=False)
+    last_snippet = models.CharField(max_length=200, blank=True, editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = MessageQuerySet.as_manager()
+
+    SNIPPET_LENGTH = 200
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sender', '-updated_at'], name='home_message_sender_idx'),
+            models.Index(fields=['receiver', '-updated_at'], name='home_message_receiver_idx'),
+        ]
 
     def __str__(self):
         return f'{self.sender.username} sent message to {self.receiver.username}'
@@ -187,16 +536,114 @@ class Message(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        badges.forget(badges.UNREAD_CONVERSATIONS, self.sender_id, self.receiver_id)
+        return result
+
+    def get_role(self, user):
+        """
+        Get the side of the conversation the user is on, 'sender' or 'receiver'.
+        """
+        return 'receiver' if user.id == self.receiver_id else 'sender'
+
+    def get_last_read(self, user):
+        """
+        Get the id of the last message the user read, annotated by with_read_state or loaded.
+        """
+        if hasattr(self, 'viewer_last_read'):
+            return self.viewer_last_read
+        return ReadCursor.objects.filter(message=self, user=user).values_list('last_read', flat=True).first() or 0
+
+    def has_unread(self, user):
+        return self.last_content_id is not None and self.last_content_id > self.get_last_read(user)
+
+    def get_unread_count(self, user):
+        return MessageContent.objects.filter(message=self, id__gt=self.get_last_read(user)).count()
+
+    def add_content(self, user, content):
+        """
+        Add a message from the user to the conversation and update its summary.
+        Replying moves the user's read cursor past everything before it.
+        """
+        from_user = self.get_role(user)
+        recipient_id = self.sender_id if from_user == 'receiver' else self.receiver_id
+        previous = self.last_content_id or 0
+        with transaction.atomic():
+            cursors = dict(ReadCursor.objects.filter(message=self).values_list('user_id', 'last_read'))
+            message_content = MessageContent.objects.create(message=self, from_user=from_user, content=content)
+            Message.objects.filter(pk=self.pk).update(
+                last_content=message_content, last_snippet=content[:self.SNIPPET_LENGTH],
+                last_message_at=message_content.created_at, updated_at=message_content.created_at)
+            self.last_content = message_content
+            self.move_read_cursor(user, message_content.id)
+            # unread conversation counters change when the state flips
+            if cursors.get(recipient_id, 0) >= previous:
+                badges.forget(badges.UNREAD_CONVERSATIONS, recipient_id)
+            if cursors.get(user.id, 0) < previous:
+                badges.forget(badges.UNREAD_CONVERSATIONS, user.id)
+        return message_content
+
+    def get_history(self, before=None, since=None):
+        """
+        Get the conversation's messages around a (created_at, id) keyset: older
+        than before, newest first, or newer than since, oldest first. Without
+        either, the latest messages come first.
+        """
+        contents = MessageContent.objects.filter(message=self)
+        # the range bounds let home_msgcontent_history_idx seek, it can't through the ORs
+        if since is not None:
+            return contents.filter(Q(created_at__gt=since[0]) | Q(created_at=since[0], id__gt=since[1]),
+                                   created_at__gte=since[0]).order_by('created_at', 'id')
+        if before is not None:
+            contents = contents.filter(Q(created_at__lt=before[0]) | Q(created_at=before[0], id__lt=before[1]),
+                                       created_at__lte=before[0])
+        return contents.order_by('-created_at', '-id')
+
+    def mark_read(self, user, last_read=None):
+        """
+        Mark the conversation read up to the given message id, the latest one by
+        default. Returns the resulting cursor, which only moves forward and never
+        past the latest message.
+        """
+        latest = self.last_content_id or 0
+        current = self.get_last_read(user)
+        last_read = min(last_read or latest, latest)
+        if last_read > current:
+            self.move_read_cursor(user, last_read)
+            if current < latest <= last_read:
+                badges.forget(badges.UNREAD_CONVERSATIONS, user.id)
+        return max(current, last_read)
+
+    def move_read_cursor(self, user, last_read):
+        """
+        Move the user's read cursor to last_read, clamped to
+        max(current cursor, min(last_read, latest message)).
+        """
+        last_read = min(last_read, self.last_content_id or 0)
+        if last_read <= 0:
+            return
+        # the row if missing, then only forward: a late or replayed read frame
+        # doesn't mark messages unread again
+        ReadCursor.objects.bulk_create([ReadCursor(message=self, user=user, last_read=last_read)],
+                                       ignore_conflicts=True)
+        ReadCursor.objects.filter(message=self, user=user, last_read__lt=last_read).update(
+            last_read=last_read, updated_at=timezone.now())
+
 
 class MessageContent(models.Model):
     FROM_CHOICES = [('sender', 'Sender'), ('receiver', 'Receiver')]
     from_user = models.CharField(max_length=10, choices=FROM_CHOICES, default='sender')
     message = models.ForeignKey(Message, on_delete=models.CASCADE)
     content = models.TextField()
-    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['message', 'created_at', 'id'], name='home_msgcontent_history_idx'),
+        ]
+
     def __str__(self):
         return self.content
 
@@ -205,3 +652,19 @@ class MessageContent(models.Model):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
+
+
+class ReadCursor(models.Model):
+    """
+    Id of the last message content a participant has read in a conversation.
+    Everything after it is unread.
+    """
+    message = models.ForeignKey(Message, related_name='read_cursors', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    last_read = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['message', 'user'], name='home_readcursor_uniq'),
+        ]
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(created_at, pk):
+    """
+    Encode a (created_at, id) keyset into an opaque cursor string.
+    """
+    return f'{(created_at - EPOCH) // timedelta(microseconds=1)}_{pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor, or return None if it is missing or invalid.
+    """
+    try:
+        micros, pk = cursor.split('_')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def get_page_size(request, setting, default=20):
+    """
+    Get the page size requested with ?size=, capped by the given setting's maximum.
+    """
+    size = getattr(settings, setting, default)
+    try:
+        size = int(request.GET.get('size', size))
+    except ValueError:
+        pass
+    return max(1, min(size, getattr(settings, 'MAX_PAGE_SIZE', 100)))
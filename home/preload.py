@@ -0,0 +1,55 @@
+import os
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+
+def get_loaders(engine):
+    for loader in engine.template_loaders:
+        # the cached loader wraps the ones reading the files
+        yield from getattr(loader, 'loaders', [loader])
+
+
+def get_template_names(engine):
+    """
+    Get the names of the templates found in the project's template directories,
+    the ones of installed third-party apps are left out.
+    """
+    names = set()
+    for loader in get_loaders(engine):
+        for directory in loader.get_dirs():
+            directory = str(directory)
+            if not os.path.abspath(directory).startswith(str(settings.BASE_DIR)):
+                continue
+            for root, _, files in os.walk(directory):
+                names.update(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/')
+                             for name in files if not name.startswith('.'))
+    return sorted(names)
+
+
+def reset_templates():
+    for backend in engines.all():
+        if isinstance(backend, DjangoTemplates):
+            for loader in backend.engine.template_loaders:
+                if hasattr(loader, 'reset'):
+                    loader.reset()
+
+
+def preload_templates():
+    """
+    Compile the project's templates into the cached template loader. Returns the
+    number of templates loaded and a {name: error} dict of the invalid ones.
+    """
+    loaded, errors = 0, {}
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in get_template_names(backend.engine):
+            try:
+                backend.engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError) as error:
+                errors[name] = error
+            else:
+                loaded += 1
+    return loaded, errors
@@ -0,0 +1,286 @@
+import atexit
+import glob
+import itertools
+import json
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: journals can't be locked, a starting process replays them all
+    fcntl = None
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .cache import bump_versions
+from .models import FeedItem, Post, Reaction
+
+
+logger = logging.getLogger(__name__)
+
+_journal_numbers = itertools.count()
+
+
+class ReactionBuffer:
+    """
+    Absorbs like/dislike toggles in memory and writes their net effect to the
+    database in batches, so a viral post doesn't take the write lock per click.
+
+    Every toggle is appended to a journal before it is acknowledged. Flushing
+    sets each (user, post) pair to its final reaction, which is idempotent, so
+    the journal can be replayed after a crash without double counting.
+
+    Each buffer writes its own journal, journal.<pid>-<n>, and holds a lock on
+    it while the process runs. On startup the journals no running process holds
+    are replayed: the ones of processes that stopped before flushing.
+    """
+
+    def __init__(self, journal, flush_interval=1.0, flush_size=500, fsync=False):
+        self.base = str(journal)
+        self.journal = f'{self.base}.{os.getpid()}-{next(_journal_numbers)}'
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        # reaction and counts as seen through the buffer, for read-your-writes.
+        # Dropped once flushed, other processes may change them from then on.
+        self.reactions = {}
+        self.counts = {}
+        # (user id, post id) -> reaction not yet written to the database
+        self.dirty = {}
+        self.thread = None
+        self.replay()
+        self.fd = open_journal(self.journal)
+
+    def toggle(self, user, post_id, kind):
+        """
+        Same contract as Reaction.toggle, served from memory.
+        """
+        key = (user.pk, int(post_id))
+        with self.lock:
+            loaded = key in self.reactions and key[1] in self.counts
+        # queried outside the lock, added in the same critical section as they
+        # are used since a flush may drop the counts meanwhile
+        kind_loaded, counts_loaded = (None, None) if loaded else self.load(key)
+        with self.lock:
+            if not loaded:
+                self.reactions.setdefault(key, kind_loaded)
+                self.counts.setdefault(key[1], counts_loaded)
+            current = self.reactions[key]
+            reaction = None if current == kind else kind
+            counts = self.counts[key[1]]
+            for old_or_new, delta in [(current, -1), (reaction, 1)]:
+                if old_or_new is not None:
+                    counts[old_or_new] += delta
+            self.reactions[key] = reaction
+            self.dirty[key] = reaction
+            self.write_journal(key, reaction)
+            pending = len(self.dirty)
+            result = reaction, counts['like'], counts['dislike']
+        self.start()
+        if pending >= self.flush_size:
+            self.wakeup.set()
+        return result
+
+    @staticmethod
+    def load(key):
+        """
+        Get the reaction of the (user id, post id) pair and the post's counts from the database.
+        """
+        user_id, post_id = key
+        like_count, dislike_count = Post.objects.filter(pk=post_id).values_list('like_count', 'dislike_count').get()
+        kind = Reaction.objects.filter(user_id=user_id, post_id=post_id).values_list('kind', flat=True).first()
+        return kind, {'like': like_count, 'dislike': dislike_count}
+
+    def write_journal(self, key, reaction):
+        line = json.dumps({'user': key[0], 'post': key[1], 'kind': reaction}) + '\n'
+        os.write(self.fd, line.encode())
+        if self.fsync:
+            os.fsync(self.fd)
+
+    def flush(self):
+        """
+        Write the buffered reactions to the database and drop the journal they came from.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if not self.dirty:
+                    return 0
+                batch, self.dirty = self.dirty, {}
+                # entries written from now on go to a fresh journal, the old one
+                # stays open (and locked) until the batch is written
+                flushing = self.journal + '.flushing'
+                os.rename(self.journal, flushing)
+                flushing_fd, self.fd = self.fd, open_journal(self.journal)
+            try:
+                apply_reactions(batch)
+            except Exception:
+                # keep the batch buffered and journaled for the next attempt
+                with self.lock:
+                    for key, reaction in batch.items():
+                        if key not in self.dirty:
+                            self.dirty[key] = reaction
+                            self.write_journal(key, reaction)
+                raise
+            finally:
+                os.remove(flushing)
+                os.close(flushing_fd)
+            with self.lock:
+                # reload them on the next toggle to pick up other processes' writes
+                busy = {post_id for _, post_id in self.dirty}
+                for key in batch:
+                    if key not in self.dirty:
+                        self.reactions.pop(key, None)
+                    if key[1] not in busy:
+                        self.counts.pop(key[1], None)
+            return len(batch)
+
+    def replay(self):
+        """
+        Apply the journals left behind by processes that stopped before flushing.
+        """
+        # the flushing journals first, they hold the older entries
+        paths = sorted(glob.glob(glob.escape(self.base) + '.*'), key=lambda path: not path.endswith('.flushing'))
+        orphans = []
+        try:
+            for path in paths:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except FileNotFoundError:
+                    continue
+                if not try_lock(fd):
+                    # the journal of a running process
+                    os.close(fd)
+                    continue
+                orphans.append((path, fd))
+            batch = {}
+            for path, fd in orphans:
+                with open(fd, closefd=False) as journal:
+                    for line in journal:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # torn write at the end of the journal
+                            continue
+                        batch[entry['user'], entry['post']] = entry['kind']
+            if batch:
+                apply_reactions(batch)
+            for path, _ in orphans:
+                os.remove(path)
+        finally:
+            for _, fd in orphans:
+                os.close(fd)
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self.run, name='reaction-buffer', daemon=True)
+                    self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.try_flush()
+
+    def try_flush(self):
+        """
+        Flush from the background thread. A failed batch stays buffered and
+        journaled for the next attempt.
+        """
+        close_old_connections()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing the reaction buffer failed, retrying in %s s', self.flush_interval)
+        finally:
+            close_old_connections()
+
+
+def try_lock(fd):
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def open_journal(path):
+    # locked as long as the process runs, see ReactionBuffer.replay
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try_lock(fd)
+    return fd
+
+
+def apply_reactions(batch):
+    """
+    Set each (user id, post id) pair of the batch to its reaction (None removes it)
+    and adjust the post counters by the net difference, in one transaction.
+    """
+    users = {user_id for user_id, _ in batch}
+    posts = {post_id for _, post_id in batch}
+    with transaction.atomic():
+        existing = {(user_id, post_id): (pk, kind) for pk, user_id, post_id, kind in
+                    Reaction.objects.filter(user_id__in=users, post_id__in=posts).values_list(
+                        'id', 'user_id', 'post_id', 'kind')}
+        deltas = {post_id: {'like': 0, 'dislike': 0} for post_id in posts}
+        removed, created, switched = [], [], {'like': [], 'dislike': []}
+        for (user_id, post_id), kind in batch.items():
+            pk, current = existing.get((user_id, post_id), (None, None))
+            if current == kind:
+                continue
+            if current is not None:
+                deltas[post_id][current] -= 1
+            if kind is not None:
+                deltas[post_id][kind] += 1
+            if kind is None:
+                removed.append(pk)
+            elif pk is None:
+                created.append(Reaction(user_id=user_id, post_id=post_id, kind=kind))
+            else:
+                switched[kind].append(pk)
+        Reaction.objects.filter(id__in=removed).delete()
+        # posts deleted in the meantime are skipped rather than failing the batch,
+        # reconcile_counters repairs the counters if a row was inserted concurrently
+        live = dict(Post.objects.filter(id__in=posts).values_list('id', 'user_id'))
+        Reaction.objects.bulk_create([reaction for reaction in created if reaction.post_id in live],
+                                     ignore_conflicts=True)
+        for kind, ids in switched.items():
+            Reaction.objects.filter(id__in=ids).update(kind=kind)
+        for post_id, delta in deltas.items():
+            if delta['like'] or delta['dislike']:
+                Post.objects.filter(pk=post_id).update(like_count=F('like_count') + delta['like'],
+                                                       dislike_count=F('dislike_count') + delta['dislike'])
+        bump_versions(*[('post', post_id) for post_id in live], *[('posts', author_id) for author_id in live.values()],
+                      *[('viewer', user_id) for user_id in users])
+        FeedItem.bump_readers(*live)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_reaction_buffer():
+    """
+    Get the process-wide reaction buffer, or None if REACTION_BUFFER is disabled.
+    """
+    global _buffer
+    options = getattr(settings, 'REACTION_BUFFER', {})
+    if not options.get('ENABLED'):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ReactionBuffer(options['JOURNAL'], options.get('FLUSH_INTERVAL', 1.0),
+                                         options.get('FLUSH_SIZE', 500), options.get('FSYNC', False))
+                atexit.register(_buffer.flush)
+    return _buffer
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import re
+import threading
+from collections import defaultdict
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import transaction
+from django.db.models import Q
+from django.http.cookie import parse_cookie
+from django.utils.dateformat import format as format_date
+from django.utils.module_loading import import_string
+from django.utils.timezone import localtime
+
+from .models import Message
+from .pagination import encode_cursor
+
+
+class LocalBroker:
+    """
+    In-process publish/subscribe between the views and the WebSocket connections
+    served by the same process. REALTIME_BROKER can point to a class with the same
+    interface (subscribe, unsubscribe, publish) to fan out across processes.
+    """
+
+    # events kept for a connection that doesn't read them, newer ones are dropped
+    max_pending = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # channel -> {(event loop, queue)} of the connections listening to it
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(self.max_pending)
+        with self.lock:
+            self.subscribers[channel].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self.lock:
+            subscribers = self.subscribers.get(channel, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self.subscribers.pop(channel, None)
+
+    def publish(self, channel, event):
+        """
+        Deliver an event to the channel's subscribers. Safe to call from any thread.
+        """
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self.deliver, queue, event)
+            except RuntimeError:
+                # the connection's event loop is already closed
+                pass
+
+    @staticmethod
+    def deliver(queue, event):
+        if not queue.full():
+            queue.put_nowait(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'REALTIME_BROKER', 'home.realtime.LocalBroker'))()
+    return _broker
+
+
+def get_channel(message_id):
+    return f'conversation:{message_id}'
+
+
+def send_message(message, user, content):
+    """
+    Add a message to the conversation and push it to the connected participants
+    once it is committed.
+    """
+    with transaction.atomic():
+        message_content = message.add_content(user, content)
+        event = {
+            'type': 'message',
+            'id': message_content.id,
+            'from_user': message_content.from_user,
+            'content': message_content.content,
+            'created_at': format_date(localtime(message_content.created_at), 'd M Y H:i'),
+            'cursor': encode_cursor(message_content.created_at, message_content.id),
+        }
+        transaction.on_commit(lambda: get_broker().publish(get_channel(message.id), event))
+    return message_content
+
+
+def read_conversation(message, user, last_read=None):
+    """
+    Move the user's read cursor (to the latest message by default, see
+    Message.mark_read) and send a read receipt with where it ends up to the
+    other participant.
+    """
+    if last_read is not None:
+        # the conversation may have moved on since the caller loaded it
+        message.refresh_from_db(fields=['last_content'])
+    with transaction.atomic():
+        last_read = message.mark_read(user, last_read)
+        event = {'type': 'read', 'role': message.get_role(user), 'last_read': last_read}
+        transaction.on_commit(lambda: get_broker().publish(get_channel(message.id), event))
+
+
+CONVERSATION_PATH = re.compile(r'^/ws/messages/(?P<pk>\d+)/$')
+
+
+def get_header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin1')
+    return None
+
+
+def load_user(session_key):
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    return get_user(SimpleNamespace(session=session))
+
+
+def get_conversation(user, pk):
+    return Message.objects.filter(Q(sender=user) | Q(receiver=user), pk=pk).first()
+
+
+async def authenticate(scope):
+    """
+    Get the user of the session cookie, or None. Connections from other sites
+    are refused, browsers send the cookie along with them too.
+    """
+    origin = get_header(scope, b'origin')
+    if origin is not None and urlsplit(origin).netloc != get_header(scope, b'host'):
+        return None
+    cookies = parse_cookie(get_header(scope, b'cookie') or '')
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if session_key is None:
+        return None
+    user = await sync_to_async(load_user)(session_key)
+    return user if user.is_authenticated else None
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI application for /ws/messages/<pk>/: pushes the conversation's new
+    messages and read receipts to a participant. The client sends {"type": "read",
+    "id": <message content id>} after displaying messages from the other participant.
+    """
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    match = CONVERSATION_PATH.match(scope['path'])
+    user = await authenticate(scope) if match else None
+    message = await sync_to_async(get_conversation)(user, int(match['pk'])) if user else None
+    if message is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+    await send({'type': 'websocket.accept'})
+    broker = get_broker()
+    channel = get_channel(message.id)
+    queue = broker.subscribe(channel)
+    receiving = asyncio.ensure_future(receive())
+    delivering = asyncio.ensure_future(queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiving, delivering}, return_when=asyncio.FIRST_COMPLETED)
+            if delivering in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(delivering.result())})
+                delivering = asyncio.ensure_future(queue.get())
+            if receiving in done:
+                event = receiving.result()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                try:
+                    frame = json.loads(event.get('text') or '{}')
+                except ValueError:
+                    frame = {}
+                if isinstance(frame, dict) and frame.get('type') == 'read' and isinstance(frame.get('id'), int):
+                    # the id of the last message the client displayed
+                    await sync_to_async(read_conversation)(message, user, max(frame['id'], 1))
+                receiving = asyncio.ensure_future(receive())
+    finally:
+        receiving.cancel()
+        delivering.cancel()
+        broker.unsubscribe(channel, queue)
@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+
+from .typeahead import get_typeahead_index, update_typeahead
+
+
+# SQLite FTS5 table with a trigram tokenizer, created by migration 0014. Its rowid is the user id.
+PEOPLE_TABLE = 'home_usersearch'
+
+# SQLite FTS5 table over post and comment contents, kept in sync by triggers (migration 0015).
+# Its rowid is the post id * 2, or the comment id * 2 + 1.
+POSTS_TABLE = 'home_postsearch'
+
+# share of the query's trigrams a name must contain to count as a typo match
+FUZZY_THRESHOLD = 0.5
+
+_available = {}
+
+
+def is_available(table=PEOPLE_TABLE):
+    """
+    Check whether a search index exists, they are skipped on databases without FTS5.
+    """
+    key = (str(connection.settings_dict['NAME']), table)
+    if key not in _available:
+        _available[key] = (connection.vendor == 'sqlite' and
+                           table in connection.introspection.table_names(include_views=True))
+    return _available[key]
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def phrase(text):
+    # FTS5 string literal, matched as a substring by the trigram tokenizer
+    return '"' + text.replace('"', '""') + '"'
+
+
+def index_user(user):
+    """
+    Add or refresh a user in the people and typeahead indexes. Called on signup
+    and profile edits.
+    """
+    update_typeahead(user)
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT OR REPLACE INTO {PEOPLE_TABLE} (rowid, username, full_name) VALUES (%s, %s, %s)',
+                           [user.id, user.username, user.get_full_name()])
+
+
+def search_users(query, limit=None):
+    """
+    Search users by username and full name, best matches first. Substring matches
+    rank first, then names sharing most of the query's trigrams (typos).
+    """
+    limit = limit or getattr(settings, 'SEARCH_RESULT_LIMIT', 50)
+    query = ' '.join(query.split())
+    if len(query) < 3 or not is_available():
+        # too short for trigrams (or no index): prefix match, bounded by the limit
+        users = User.objects.filter(Q(username__istartswith=query) | Q(first_name__istartswith=query) |
+                                    Q(last_name__istartswith=query))
+        return list(users.order_by('username').values_list('id', flat=True)[:limit])
+    with connection.cursor() as cursor:
+        # names starting with the query first, the index matches substrings anywhere
+        prefix = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        cursor.execute(f"SELECT rowid FROM {PEOPLE_TABLE} WHERE {PEOPLE_TABLE} MATCH %s "
+                       f"ORDER BY (username LIKE %s ESCAPE '\\' OR full_name LIKE %s ESCAPE '\\') DESC, "
+                       f"bm25({PEOPLE_TABLE}, 2.0, 1.0) LIMIT %s", [phrase(query), prefix, prefix, limit])
+        ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) < limit:
+            wanted = trigrams(query)
+            cursor.execute(f'SELECT rowid, username, full_name FROM {PEOPLE_TABLE} WHERE {PEOPLE_TABLE} MATCH %s '
+                           f'ORDER BY bm25({PEOPLE_TABLE}, 2.0, 1.0) LIMIT %s',
+                           [' OR '.join(phrase(trigram) for trigram in sorted(wanted)), limit * 4])
+            found = set(ids)
+            for user_id, username, full_name in cursor.fetchall():
+                shared = max(len(wanted & trigrams(username)), len(wanted & trigrams(full_name)))
+                if user_id not in found and shared >= FUZZY_THRESHOLD * len(wanted):
+                    ids.append(user_id)
+                    if len(ids) == limit:
+                        break
+    return ids
+
+
+def complete_users(prefix, limit=8, boost=(), exclude=()):
+    """
+    Return up to limit (user id, username, full name) tuples for the search box
+    suggestions, see TypeaheadIndex.complete. Until the process has built its
+    typeahead index the people search answers, without the boost.
+    """
+    index = get_typeahead_index()
+    if index is not None:
+        return index.complete(prefix, limit, boost, exclude)
+    if not prefix.split():
+        return []
+    ids = [user_id for user_id in search_users(prefix, limit + len(exclude)) if user_id not in exclude][:limit]
+    users = User.objects.in_bulk(ids)
+    return [(user_id, users[user_id].username, users[user_id].get_full_name()) for user_id in ids if user_id in users]
+
+
+def match_words(query):
+    """
+    Turn user input into an FTS5 query matching all its words, the last one as a prefix.
+    """
+    words = [phrase(word) for word in query.split()]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+def search_posts(viewer, query, page=1, page_size=None):
+    """
+    Search the posts visible to the viewer (public ones, their friends' and
+    their own) by post and comment content, best matches first. Returns the
+    post ids of the page and whether there is a next page.
+    """
+    page_size = page_size or getattr(settings, 'SEARCH_RESULT_LIMIT', 50)
+    query = match_words(query)
+    if not query or not is_available(POSTS_TABLE):
+        return [], False
+    authors = [viewer.id, *viewer.profile.get_friend_ids()]
+    placeholders = ', '.join(['%s'] * len(authors))
+    with connection.cursor() as cursor:
+        # a post matching through several comments counts with its best match
+        cursor.execute(f"SELECT found.post_id FROM (SELECT post_id, rank FROM {POSTS_TABLE} WHERE {POSTS_TABLE} MATCH %s) "
+                       f"AS found INNER JOIN home_post ON home_post.id = found.post_id "
+                       f"WHERE home_post.visibility = 'public' OR home_post.user_id IN ({placeholders}) "
+                       f"GROUP BY found.post_id ORDER BY min(found.rank), found.post_id DESC LIMIT %s OFFSET %s",
+                       [query, *authors, page_size + 1, (page - 1) * page_size])
+        ids = [row[0] for row in cursor.fetchall()]
+    return ids[:page_size], len(ids) > page_size
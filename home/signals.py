@@ -0,0 +1,109 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import blobs
+from .accounts import remember_account
+from .backends import forget_user
+from .cache import bump_versions
+from .images import variants_saved
+from .models import Comment, FeedItem, FriendRequests, Post, Profile
+
+
+# Bump the cache versions of what a change makes stale. Reactions and counter
+# updates go through queryset updates and bump their versions themselves, image
+# variants send variants_saved.
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    bump_versions(('user', instance.pk))
+    forget_session_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    remember_account(instance)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    bump_versions(('user', instance.user_id))
+    forget_session_user(instance.user_id)
+
+
+def forget_session_user(user_id):
+    # the user and profile loaded with the session (see EmailBackend.get_user),
+    # again once committed as requests may load the old rows meanwhile
+    forget_user(user_id)
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver(post_delete, sender=Profile)
+def profile_photos_released(sender, instance, **kwargs):
+    blobs.detach(instance, ['profile_pic', 'cover_pic'])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    bump_versions(('post', instance.pk), ('posts', instance.user_id), ('viewer', instance.user_id))
+    # new posts bump the feeds they are delivered to in FeedItem.fan_out
+    if kwargs.get('created') is False:
+        FeedItem.bump_readers(instance.pk)
+
+
+@receiver(variants_saved, sender=Post)
+def post_variants_saved(sender, instance, **kwargs):
+    bump_versions(('post', instance.pk), ('posts', instance.user_id))
+    FeedItem.bump_readers(instance.pk)
+
+
+@receiver(variants_saved, sender=Profile)
+def profile_variants_saved(sender, instance, **kwargs):
+    bump_versions(('user', instance.user_id))
+    forget_session_user(instance.user_id)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    # the feed items go before post_delete
+    FeedItem.bump_readers(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    dependencies = [('post', instance.post_id), ('viewer', instance.user_id)]
+    # comments deleted along with their post come without it, the post's own signal covers them
+    if Comment.post.is_cached(instance):
+        dependencies.append(('posts', instance.post.user_id))
+    bump_versions(*dependencies)
+    FeedItem.bump_readers(instance.post_id)
+
+
+@receiver(post_save, sender=FriendRequests)
+@receiver(post_delete, sender=FriendRequests)
+def friend_request_changed(sender, instance, **kwargs):
+    bump_versions(('viewer', instance.sender_user_id), ('viewer', instance.receiver_user_id))
+
+
+@receiver(pre_delete, sender=Profile)
+def profile_deleted(sender, instance, **kwargs):
+    # the friendships go with the profile without sending m2m_changed
+    friends_changed(Profile.friends.through, instance, 'pre_clear')
+
+
+@receiver(m2m_changed, sender=Profile.friends.through)
+def friends_changed(sender, instance, action, pk_set=None, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        profiles = [instance.pk, *pk_set]
+    elif action == 'pre_clear':
+        # listed before they go, bump_versions waits for the commit
+        profiles = [instance.pk, *instance.friends.values_list('pk', flat=True)]
+    else:
+        return
+    user_ids = Profile.objects.filter(pk__in=profiles).values_list('user_id', flat=True)
+    bump_versions(*[('friends', user_id) for user_id in user_ids])
@@ -0,0 +1,104 @@
+import heapq
+import multiprocessing
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.db import connections, transaction
+
+from .models import FriendSuggestion, Profile
+
+
+def batches(ids, size):
+    ids = list(ids)
+    return (ids[i:i + size] for i in range(0, len(ids), size))
+
+
+def load_graph(profile_ids=None, batch_size=5000):
+    """
+    Load the friend graph as sorted arrays of friend profile ids. With profile_ids,
+    only the edges needed to score those profiles (two hops) are loaded, querying
+    batch_size profiles at a time.
+    """
+    edges = Profile.friends.through.objects.values_list('from_profile_id', 'to_profile_id')
+    adjacency = defaultdict(list)
+    if profile_ids is None:
+        for source, target in edges.iterator():
+            adjacency[source].append(target)
+    else:
+        first_hop = set(profile_ids)
+        for batch in batches(profile_ids, batch_size):
+            for source, target in edges.filter(from_profile_id__in=batch).iterator():
+                adjacency[source].append(target)
+                first_hop.add(target)
+        for batch in batches(first_hop - set(profile_ids), batch_size):
+            for source, target in edges.filter(from_profile_id__in=batch).iterator():
+                adjacency[source].append(target)
+    return {profile_id: array('q', sorted(friends)) for profile_id, friends in adjacency.items()}
+
+
+def contains(sorted_ids, value):
+    index = bisect_left(sorted_ids, value)
+    return index < len(sorted_ids) and sorted_ids[index] == value
+
+
+def suggest(adjacency, profile_id, top):
+    """
+    Rank the friends of the profile's friends that aren't already its friends
+    by their number of mutual friends, returning the top (candidate, count) pairs.
+    """
+    friends = adjacency.get(profile_id, array('q'))
+    mutual = Counter()
+    for friend in friends:
+        mutual.update(adjacency.get(friend, ()))
+    candidates = ((count, candidate) for candidate, count in mutual.items()
+                  if candidate != profile_id and not contains(friends, candidate))
+    # most mutual friends first, oldest profile first on ties
+    best = heapq.nsmallest(top, candidates, key=lambda item: (-item[0], item[1]))
+    return [(candidate, count) for count, candidate in best]
+
+
+_graph = None
+
+
+def _suggest_chunk(args):
+    profile_ids, top = args
+    return [(profile_id, suggest(_graph, profile_id, top)) for profile_id in profile_ids]
+
+
+def compute_suggestions(profile_ids=None, top=10, processes=1, chunk_size=500):
+    """
+    Recompute and store the suggestions of the given profiles (all profiles if
+    None), spreading the scoring over several processes. Returns the number of
+    profiles processed. Callers with many profiles pass them in batches, see
+    the compute_suggestions command.
+    """
+    global _graph
+    if profile_ids is None:
+        _graph = load_graph()
+        profile_ids = list(Profile.objects.values_list('id', flat=True))
+    else:
+        _graph = load_graph(profile_ids)
+    chunks = [(profile_ids[i:i + chunk_size], top) for i in range(0, len(profile_ids), chunk_size)]
+    if processes > 1 and len(chunks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # forked workers inherit the graph, they must not share the parent's connections
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            results = pool.imap_unordered(_suggest_chunk, chunks)
+            for chunk in results:
+                save_suggestions(chunk)
+    else:
+        for chunk in chunks:
+            save_suggestions(_suggest_chunk(chunk))
+    _graph = None
+    return len(profile_ids)
+
+
+def save_suggestions(chunk):
+    profile_ids = [profile_id for profile_id, _ in chunk]
+    with transaction.atomic():
+        FriendSuggestion.objects.filter(profile_id__in=profile_ids).delete()
+        FriendSuggestion.objects.bulk_create([
+            FriendSuggestion(profile_id=profile_id, candidate_id=candidate, mutual_count=count)
+            for profile_id, suggestions in chunk for candidate, count in suggestions
+        ])
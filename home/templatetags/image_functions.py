@@ -0,0 +1,20 @@
+from django import template
+
+from ..images import get_variants_field
+
+
+register = template.Library()
+
+
+@register.filter
+def variant(file, size):
+    """
+    URL of a resized variant of an image field, the uploaded file's until the
+    variant is built or if the file has none.
+    """
+    if not file:
+        return ''
+    variants = getattr(file.instance, get_variants_field(file.field.name), {})
+    if size in variants and variants.get('source') == file.name:
+        return file.storage.url(variants[size])
+    return file.url
@@ -11,13 +11,10 @@ def get_latest_message(message_id):
     Get the latest message for a given message_id.
     """
     try:
-        message = Message.objects.get(pk=message_id)
-        latest_message = MessageContent.objects.filter(message=message).latest('created_at')
-        return latest_message
+        message = Message.objects.select_related('last_content').get(pk=message_id)
     except Message.DoesNotExist:
         return "Message does not exist."
-    except MessageContent.DoesNotExist:
-        return "No message to show."
+    return message.last_content or "No message to show."
 
 
 @register.simple_tag
@@ -27,12 +24,13 @@ def is_latest_read(message_id):
     """
     try:
         message = Message.objects.get(pk=message_id)
-        latest_message = MessageContent.objects.filter(message=message).latest('created_at')
-        return latest_message.is_read
     except Message.DoesNotExist:
         return "Message does not exist."
-    except MessageContent.DoesNotExist:
+    if message.last_content_id is None:
         return "Message content does not exist."
+    # read once the cursor of the participant it was sent to reaches it
+    recipient = message.receiver if message.last_content.from_user == 'sender' else message.sender
+    return not message.has_unread(recipient)
 
 
 @register.simple_tag
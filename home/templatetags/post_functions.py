@@ -1,5 +1,6 @@
 from django import template
-from ..models import FriendRequests
+from ..cache import get_versions
+from ..models import FriendRequests, Reaction
 
 
 register = template.Library()
@@ -7,23 +8,28 @@ register = template.Library()
 
 @register.simple_tag
 def is_liked(post, user):
-    if post.likes.filter(id=user.id).exists():
+    # precomputed by Post.objects.with_details()
+    if hasattr(post, 'viewer_liked'):
+        return post.viewer_liked
+    if Reaction.objects.filter(post=post, user=user, kind='like').exists():
         return True
     return False
 
 
 @register.simple_tag
 def is_disliked(post, user):
-    if post.dislikes.filter(id=user.id).exists():
+    # precomputed by Post.objects.with_details()
+    if hasattr(post, 'viewer_disliked'):
+        return post.viewer_disliked
+    if Reaction.objects.filter(post=post, user=user, kind='dislike').exists():
         return True
     return False
 
 
 @register.simple_tag
 def is_friend(user, friend):
-    if user.friends.filter(id=friend.profile.id).exists():
-        return True
-    return False
+    # served from the cached friend set of the profile
+    return user.is_friend(friend)
 
 
 @register.simple_tag
@@ -31,3 +37,9 @@ def is_friend_request(sender, receiver):
     if FriendRequests.objects.filter(sender_user=sender, receiver_user=receiver).exists():
         return True
     return False
+
+
+@register.filter
+def version(pk, namespace):
+    # cache version of (namespace, pk), to key cached fragments on it
+    return get_versions((namespace, pk))[0]
@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from home import backends
+from home.models import Profile
+
+# the configured tiers, with process-local shared tiers instead of the cache directory
+TEST_CACHES = {
+    alias: {
+        'BACKEND': 'home.cache.TieredCache',
+        'LOCATION': f'test-{alias}',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SHARED': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'},
+        },
+    } for alias in ('default', 'sessions')
+}
+
+
+def create_user(username, password='password', **fields):
+    fields = {'email': f'{username}@example.com', 'first_name': username.title(), 'last_name': 'Test', **fields}
+    user = User.objects.create_user(username=username, password=password, **fields)
+    Profile.objects.create(user=user, profile_pic='profile.png', cover_pic='cover.svg')
+    return user
+
+
+@override_settings(CACHES=TEST_CACHES, IMAGE_WORKERS=0,
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class HomeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # ids are reused once a test's rows are rolled back
+        backends._users.clear()
+
+    def login(self, user):
+        self.client.force_login(user)
+        # the first response sets the CSRF cookie, pages are cached from then on
+        self.client.get(reverse('friends'))
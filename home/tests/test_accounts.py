@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+
+from home.accounts import AccountFilter, BloomFilter, build_account_filter, email_taken, username_taken
+
+from .base import HomeTestCase, create_user
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_added_values_are_always_found(self):
+        bloom = BloomFilter(5000)
+        values = [f'user{i}@example.com' for i in range(5000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f'user{i}')
+        false_positives = sum(f'other{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class AccountTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        create_user('Alice', email='Alice@Example.com')
+        build_account_filter()
+
+    def test_duplicates_are_found_ignoring_case(self):
+        self.assertTrue(email_taken('alice@example.COM'))
+        self.assertTrue(username_taken('ALICE'))
+        self.assertFalse(email_taken('bob@example.com'))
+        self.assertFalse(username_taken('bob'))
+
+    def test_free_names_are_ruled_out_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(username_taken('bob'))
+
+    def test_signups_are_added_to_the_filter(self):
+        create_user('Bob')
+        self.assertTrue(username_taken('bob'))
+        self.assertTrue(email_taken('BOB@example.com'))
+
+    def test_accounts_without_email_do_not_take_the_empty_one(self):
+        User.objects.create_user('carol', email='')
+        self.assertFalse(email_taken(''))
+
+    def test_signups_during_a_build_are_kept(self):
+        account_filter = AccountFilter()
+        count = User.objects.count
+
+        def count_during_a_signup():
+            # signed up by another thread while the build reads the table
+            account_filter.add(User(email='Dave@example.com', username='Dave'))
+            return count()
+
+        with mock.patch.object(User.objects, 'count', side_effect=count_during_a_signup):
+            account_filter.build()
+        self.assertIn('dave', account_filter.usernames)
+        self.assertIn('dave@example.com', account_filter.emails)
+        self.assertIn('alice', account_filter.usernames)
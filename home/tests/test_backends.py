@@ -0,0 +1,81 @@
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+from home import backends
+from home.backends import EmailBackend
+from home.models import Profile
+
+from .base import HomeTestCase, create_user
+
+
+class EmailBackendTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('alice')
+
+    def test_authenticate_by_email_or_username_ignoring_case(self):
+        backend = EmailBackend()
+        self.assertEqual(backend.authenticate(None, 'ALICE@example.com', 'password'), self.user)
+        self.assertEqual(backend.authenticate(None, 'Alice', 'password'), self.user)
+        self.assertIsNone(backend.authenticate(None, 'alice', 'wrong'))
+        self.assertIsNone(backend.authenticate(None, 'nobody', 'password'))
+
+    def test_login_session(self):
+        self.assertTrue(self.client.login(username='alice@example.com', password='password'))
+        self.assertEqual(self.client.get(reverse('index')).context['user'], self.user)
+        self.client.logout()
+        self.assertRedirects(self.client.get(reverse('profile')), '/login/?next=/profile/',
+                             fetch_redirect_response=False)
+
+
+class SessionUserCacheTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('alice')
+
+    def test_get_user_is_served_from_memory_with_its_profile(self):
+        backend = EmailBackend()
+        backend.get_user(self.user.id)
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.user.id)
+            self.assertEqual(user.profile.profile_pic.name, 'profile.png')
+        self.assertEqual(user, self.user)
+
+    def test_saves_evict_the_cached_user(self):
+        backend = EmailBackend()
+        backend.get_user(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Alicia'
+            self.user.save()
+        self.assertEqual(backend.get_user(self.user.id).first_name, 'Alicia')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.bio = 'Hello'
+            self.user.profile.save(update_fields=['bio'])
+        self.assertEqual(backend.get_user(self.user.id).profile.bio, 'Hello')
+
+    def test_photo_uploads_keep_the_changes_made_since_the_user_was_cached(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('friends'))
+        # edited by another process, the snapshot cached with the session is older
+        Profile.objects.filter(user=self.user).update(bio='Hello')
+        content = BytesIO()
+        Image.new('RGB', (10, 10)).save(content, 'PNG')
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            cover = SimpleUploadedFile('cover.png', content.getvalue())
+            response = self.client.post(reverse('profile'), {'cover': cover})
+        self.assertRedirects(response, '/profile/', fetch_redirect_response=False)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(profile.bio, 'Hello')
+        self.assertNotEqual(profile.cover_pic.name, 'cover.svg')
+
+    def test_inactive_users_are_not_served(self):
+        backend = EmailBackend()
+        backend.get_user(self.user.id)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        backends.forget_user(self.user.id)
+        self.assertIsNone(backend.get_user(self.user.id))
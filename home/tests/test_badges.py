@@ -0,0 +1,71 @@
+from django.urls import reverse
+
+from home.badges import get_badges
+from home.models import FriendRequests, Message
+
+from .base import HomeTestCase, create_user
+
+
+class BadgeTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = create_user('alice'), create_user('bob')
+
+    def assert_badges(self, user, unread_conversations, friend_requests):
+        self.assertEqual(get_badges(user), {'unread_conversations': unread_conversations,
+                                            'friend_requests': friend_requests})
+
+    def test_counters_are_served_from_the_cache(self):
+        self.assert_badges(self.alice, 0, 0)
+        with self.assertNumQueries(0):
+            self.assert_badges(self.alice, 0, 0)
+
+    def test_friend_requests(self):
+        self.assert_badges(self.bob, 0, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.profile.send_friend_request(self.bob)
+        self.assert_badges(self.bob, 0, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.profile.revoke_friend_request(self.bob)
+        self.assert_badges(self.bob, 0, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.profile.send_friend_request(self.bob)
+        self.assert_badges(self.bob, 0, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            FriendRequests.objects.get(sender_user=self.alice).reject()
+        self.assert_badges(self.bob, 0, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.profile.send_friend_request(self.bob)
+        self.assert_badges(self.bob, 0, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.profile.accept_friend_request(self.alice)
+        self.assert_badges(self.bob, 0, 0)
+        self.assertTrue(self.bob.profile.is_friend(self.alice))
+
+    def test_unread_conversations(self):
+        message = Message.objects.create(sender=self.alice, receiver=self.bob)
+        self.assert_badges(self.bob, 0, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.add_content(self.alice, 'hello')
+        self.assert_badges(self.bob, 1, 0)
+        # still one conversation
+        with self.captureOnCommitCallbacks(execute=True):
+            message.add_content(self.alice, 'again')
+        self.assert_badges(self.bob, 1, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.add_content(self.bob, 'hi')
+        self.assert_badges(self.bob, 0, 0)
+        self.assert_badges(self.alice, 1, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.mark_read(self.alice)
+        self.assert_badges(self.alice, 0, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.add_content(self.bob, 'bye')
+            message.delete()
+        self.assert_badges(self.alice, 0, 0)
+
+    def test_navbar_shows_the_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.profile.send_friend_request(self.bob)
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get(reverse('friends')).context['badges']['friend_requests'], 1)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from home import blobs
+from home.models import Blob
+
+from .base import HomeTestCase, create_user
+
+
+class BlobTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, user, content):
+        user.profile.profile_pic = SimpleUploadedFile('photo.png', content)
+        user.profile.save()
+
+    def get_blob(self, content):
+        return Blob.objects.get(sha256=blobs.hash_file(ContentFile(content)))
+
+    def list_files(self):
+        return sorted(os.path.relpath(os.path.join(path, name), self.media_root)
+                      for path, _, names in os.walk(self.media_root) for name in names)
+
+    def test_same_content_is_stored_once(self):
+        alice, bob = create_user('alice'), create_user('bob')
+        self.upload(alice, b'photo')
+        self.upload(bob, b'photo')
+        blob = self.get_blob(b'photo')
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(alice.profile.profile_pic.name, bob.profile.profile_pic.name)
+        self.assertEqual(self.list_files(), [blob.file.name])
+
+    def test_references_move_with_the_photo(self):
+        alice = create_user('alice')
+        self.upload(alice, b'first')
+        self.upload(alice, b'second')
+        self.assertEqual(self.get_blob(b'first').ref_count, 0)
+        self.assertEqual(self.get_blob(b'second').ref_count, 1)
+        # saves leaving the photo alone keep the reference
+        alice.profile.bio = 'Hello'
+        alice.profile.save(update_fields=['bio'])
+        alice.profile.save()
+        self.assertEqual(self.get_blob(b'second').ref_count, 1)
+
+    def test_deleted_profiles_release_their_blobs(self):
+        alice, bob = create_user('alice'), create_user('bob')
+        self.upload(alice, b'photo')
+        self.upload(bob, b'photo')
+        alice.delete()
+        self.assertEqual(self.get_blob(b'photo').ref_count, 1)
+        bob.profile.delete()
+        self.assertEqual(self.get_blob(b'photo').ref_count, 0)
+
+    def test_concurrent_copy_is_deleted(self):
+        blobs.store(ContentFile(b'photo'), 'photo.png')
+        Blob.objects.all().delete()
+        # another request stored the file between the check and the save
+        storage_class = type(default_storage._wrapped)
+        exists = storage_class.exists
+        with mock.patch.object(storage_class, 'exists', autospec=True) as check:
+            check.side_effect = lambda storage, name: check.call_count > 1 and exists(storage, name)
+            blob = blobs.store(ContentFile(b'photo'), 'photo.png')
+        self.assertEqual(self.list_files(), [blob.file.name])
@@ -0,0 +1,100 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from home.cache import FileCache, bump_versions, cached
+from home.models import Post, Reaction
+
+from .base import HomeTestCase, create_user
+
+
+class VersionTests(HomeTestCase):
+    def test_bumping_a_version_recomputes_the_values_cached_against_it(self):
+        computed = []
+
+        def compute():
+            computed.append(1)
+            return len(computed)
+
+        self.assertEqual(cached('value', [('post', 1)], compute), 1)
+        self.assertEqual(cached('value', [('post', 1)], compute), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions(('post', 2))
+        self.assertEqual(cached('value', [('post', 1)], compute), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions(('post', 1))
+        self.assertEqual(cached('value', [('post', 1)], compute), 2)
+
+    def test_versions_are_bumped_once_committed(self):
+        cached('value', [('post', 1)], lambda: 'before')
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_versions(('post', 1), ('post', 1))
+            self.assertEqual(cached('value', [('post', 1)], lambda: 'during'), 'before')
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(cached('value', [('post', 1)], lambda: 'after'), 'after')
+
+
+class ViewCacheTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer, self.friend = create_user('alice'), create_user('bob')
+        self.viewer.profile.add_friend(self.friend.profile)
+
+    def test_cached_newsfeed_shows_a_friend_new_post(self):
+        self.login(self.viewer)
+        self.assertNotContains(self.client.get(reverse('index')), 'first post')
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(user=self.friend, content='first post')
+        self.assertContains(self.client.get(reverse('index')), 'first post')
+
+    def test_cached_newsfeed_shows_new_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(user=self.friend, content='first post')
+        self.login(self.viewer)
+        self.assertRegex(self.client.get(reverse('index')).content.decode(), rf'id="like_count{post.id}">\s*0\s*<')
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.toggle(self.friend, post.id, 'like')
+        self.assertRegex(self.client.get(reverse('index')).content.decode(), rf'id="like_count{post.id}">\s*1\s*<')
+
+
+class FileCacheTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def get_caches(self, max_entries=1000, cull_interval=60):
+        return {'default': {
+            'BACKEND': 'home.cache.TieredCache',
+            'LOCATION': f'test-file-{self.id()}',
+            'OPTIONS': {'SHARED': {'BACKEND': 'home.cache.FileCache', 'LOCATION': self.directory,
+                                   'OPTIONS': {'MAX_ENTRIES': max_entries, 'CULL_INTERVAL': cull_interval}}},
+        }}
+
+    def test_directory_is_listed_once_per_interval(self):
+        with override_settings(CACHES=self.get_caches(max_entries=10)), \
+                mock.patch.object(FileCache, '_list_cache_files', autospec=True,
+                                  side_effect=FileCache._list_cache_files) as listed:
+            for i in range(50):
+                cache.set(f'key{i}', i)
+        self.assertEqual(listed.call_count, 1)
+
+    def test_toggle_writes_are_bounded(self):
+        author = create_user('carol')
+        post = Post.objects.create(user=author, content='viral')
+        users = [create_user(f'user{i}') for i in range(10)]
+        with override_settings(CACHES=self.get_caches()), \
+                mock.patch.object(FileCache, '_list_cache_files', autospec=True,
+                                  side_effect=FileCache._list_cache_files) as listed, \
+                mock.patch.object(FileCache, 'set', autospec=True, side_effect=FileCache.set) as written:
+            with self.captureOnCommitCallbacks(execute=True):
+                for user in users:
+                    Reaction.toggle(user, post.id, 'like')
+        # the post, its author's posts, the viewer and the author's feed
+        self.assertLessEqual(written.call_count, 4 * len(users))
+        self.assertLessEqual(listed.call_count, 1)
@@ -0,0 +1,72 @@
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from home import images
+from home.models import Post
+from home.templatetags.image_functions import variant
+
+from .base import HomeTestCase, create_user
+
+
+def create_image(width=1000, height=500):
+    content = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(content, 'PNG')
+    return content.getvalue()
+
+
+class VariantTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.viewer, self.author = create_user('alice'), create_user('bob')
+        self.viewer.profile.add_friend(self.author.profile)
+
+    def create_post(self, content):
+        # variants built by the test
+        with self.captureOnCommitCallbacks(execute=True), mock.patch.object(images, 'schedule_variants'):
+            return Post.objects.create(user=self.author, content='photo',
+                                       attachment=SimpleUploadedFile('photo.png', content))
+
+    def build_variants(self, post):
+        with self.captureOnCommitCallbacks(execute=True):
+            images.run_job('home.Post', post.pk, 'attachment', post.attachment.name)
+        return Post.objects.get(pk=post.pk)
+
+    def test_uploaded_file_is_served_until_the_variant_is_built(self):
+        post = self.create_post(create_image())
+        self.assertEqual(variant(post.attachment, 'feed'), post.attachment.url)
+        post = self.build_variants(post)
+        self.assertNotEqual(variant(post.attachment, 'feed'), post.attachment.url)
+        with Image.open(post.attachment.storage.path(post.attachment_variants['feed'])) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (720, 360)))
+
+    def test_files_that_are_not_images_have_no_variants(self):
+        post = self.build_variants(self.create_post(b'not an image'))
+        self.assertEqual(post.attachment_variants, {'source': post.attachment.name})
+        self.assertEqual(variant(post.attachment, 'feed'), post.attachment.url)
+
+    def test_variants_of_a_replaced_file_are_not_served(self):
+        post = self.build_variants(self.create_post(create_image()))
+        post.attachment.name = 'other.png'
+        self.assertEqual(variant(post.attachment, 'feed'), post.attachment.url)
+
+    def test_building_variants_does_not_edit_the_post(self):
+        post = self.create_post(create_image())
+        self.client.force_login(self.viewer)
+        self.client.get(reverse('index'))
+        self.assertContains(self.client.get(reverse('index')), post.attachment.url)
+        built = self.build_variants(post)
+        self.assertEqual(built.updated_at, post.updated_at)
+        self.assertEqual(built.slug, post.slug)
+        # the cached page and post card show the variant
+        self.assertContains(self.client.get(reverse('index')), variant(built.attachment, 'feed'))
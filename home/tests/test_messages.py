@@ -0,0 +1,95 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from home.models import Message, MessageContent, ReadCursor
+
+from .base import HomeTestCase, create_user
+
+
+class ReadCursorTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sender, self.receiver = create_user('alice'), create_user('bob')
+        self.message = Message.objects.create(sender=self.sender, receiver=self.receiver)
+        self.contents = [self.message.add_content(self.sender, f'message {i}') for i in range(3)]
+
+    def get_cursor(self):
+        return ReadCursor.objects.get(message=self.message, user=self.receiver).last_read
+
+    def test_mark_read_defaults_to_the_latest_message(self):
+        self.assertTrue(self.message.has_unread(self.receiver))
+        self.assertEqual(self.message.mark_read(self.receiver), self.contents[-1].id)
+        self.assertFalse(self.message.has_unread(self.receiver))
+
+    def test_cursor_stops_at_the_latest_message(self):
+        self.assertEqual(self.message.mark_read(self.receiver, self.contents[-1].id + 1000), self.contents[-1].id)
+        self.assertEqual(self.get_cursor(), self.contents[-1].id)
+        later = self.message.add_content(self.sender, 'later')
+        self.assertTrue(Message.objects.get(pk=self.message.pk).has_unread(self.receiver))
+        self.assertEqual(MessageContent.objects.filter(id__gt=self.get_cursor()).get(), later)
+
+    def test_cursor_only_moves_forward(self):
+        self.message.mark_read(self.receiver, self.contents[1].id)
+        self.assertEqual(self.message.mark_read(self.receiver, self.contents[0].id), self.contents[1].id)
+        self.message.move_read_cursor(self.receiver, self.contents[0].id)
+        self.assertEqual(self.get_cursor(), self.contents[1].id)
+
+    def test_replying_reads_the_conversation(self):
+        self.message.add_content(self.receiver, 'reply')
+        self.assertFalse(self.message.has_unread(self.receiver))
+        self.assertTrue(Message.objects.get(pk=self.message.pk).has_unread(self.sender))
+
+    def test_opening_the_conversation_reads_it(self):
+        self.client.force_login(self.receiver)
+        self.assertEqual(self.client.get(reverse('message_detail', args=[self.message.pk])).status_code, 200)
+        self.assertEqual(self.get_cursor(), self.contents[-1].id)
+
+    def test_other_users_cannot_read_the_conversation(self):
+        self.client.force_login(create_user('eve'))
+        url = reverse('message_detail', args=[self.message.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(url, {'send_message': '', 'content': 'hi'}).status_code, 404)
+        response = self.client.post(reverse('messages'), {'action': 'mark_read', 'message_id': self.message.pk})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(ReadCursor.objects.filter(user__username='eve').exists())
+        self.assertEqual(self.message.messagecontent_set.count(), 3)
+
+
+class InboxTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = create_user('alice')
+        self.client.force_login(self.viewer)
+
+    def start_conversation(self, username, *contents):
+        other = create_user(username)
+        message = Message.objects.create(sender=other, receiver=self.viewer)
+        for content in contents:
+            message.add_content(other, content)
+        return message
+
+    def test_summary_follows_the_latest_message(self):
+        message = self.start_conversation('bob', 'hello', 'x' * 300)
+        message.refresh_from_db()
+        self.assertEqual(message.last_snippet, 'x' * Message.SNIPPET_LENGTH)
+        self.assertEqual(message.last_message_at, message.last_content.created_at)
+        reply = message.add_content(self.viewer, 'hi')
+        message.refresh_from_db()
+        self.assertEqual((message.last_content, message.last_snippet), (reply, 'hi'))
+
+    def test_inbox_shows_the_unread_counts(self):
+        message = self.start_conversation('bob', 'one', 'two', 'three')
+        message.mark_read(self.viewer, message.last_content_id - 1)
+        inbox = self.client.get(reverse('messages')).context['object_list']
+        self.assertEqual([(row.last_snippet, row.unread_count) for row in inbox], [('three', 1)])
+
+    def test_inbox_queries_do_not_grow_with_conversations(self):
+        self.start_conversation('bob', 'hello')
+        self.client.get(reverse('messages'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('messages'))
+        for i in range(5):
+            self.start_conversation(f'user{i}', 'hello', 'again')
+        with self.assertNumQueries(len(queries)):
+            self.assertContains(self.client.get(reverse('messages')), 'again')
@@ -0,0 +1,48 @@
+from django.test import override_settings
+
+from home.models import FeedItem, Post, Profile
+
+from .base import HomeTestCase, create_user
+
+
+class FanOutTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer, self.friend, self.stranger = create_user('alice'), create_user('bob'), create_user('carol')
+        self.viewer.profile.add_friend(self.friend.profile)
+
+    def read_newsfeed(self, user):
+        return [post.content for post in user.profile.get_newsfeed()]
+
+    def test_posts_are_delivered_to_the_author_and_friends(self):
+        Post.objects.create(user=self.friend, content='hello')
+        self.assertEqual(self.read_newsfeed(self.viewer), ['hello'])
+        self.assertEqual(self.read_newsfeed(self.friend), ['hello'])
+        self.assertEqual(self.read_newsfeed(self.stranger), [])
+
+    @override_settings(NEWSFEED_BACKFILL_SIZE=2)
+    def test_new_friends_get_each_other_latest_posts(self):
+        for i in range(3):
+            Post.objects.create(user=self.stranger, content=f'post {i}')
+        Post.objects.create(user=self.viewer, content='mine')
+        self.viewer.profile.add_friend(self.stranger.profile)
+        self.assertEqual(self.read_newsfeed(self.viewer), ['mine', 'post 2', 'post 1'])
+        self.assertEqual(self.read_newsfeed(self.stranger), ['mine', 'post 2', 'post 1', 'post 0'])
+
+    def test_former_friends_leave_each_other_feeds(self):
+        Post.objects.create(user=self.friend, content='theirs')
+        Post.objects.create(user=self.viewer, content='mine')
+        self.viewer.profile.remove_friend(self.friend.profile)
+        self.assertEqual(self.read_newsfeed(self.viewer), ['mine'])
+        self.assertEqual(self.read_newsfeed(self.friend), ['theirs'])
+
+    @override_settings(NEWSFEED_FANOUT_LIMIT=1)
+    def test_authors_with_many_friends_are_read_on_demand(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.friend.profile.add_friend(self.stranger.profile)
+            Post.objects.create(user=self.friend, content='popular')
+        self.assertTrue(Profile.objects.get(user=self.friend).fanout_on_read)
+        self.assertEqual(list(FeedItem.objects.filter(post__content='popular').values_list('user', flat=True)),
+                         [self.friend.id])
+        self.assertEqual(self.read_newsfeed(self.viewer), ['popular'])
+        self.assertEqual(self.read_newsfeed(self.stranger), ['popular'])
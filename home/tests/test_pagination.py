@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+
+from django.urls import reverse
+
+from home.cache import bump_versions
+from home.models import Message, Post, Profile
+from home.pagination import decode_cursor, encode_cursor
+
+from .base import HomeTestCase, create_user
+
+
+class NewsfeedPaginationTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer, self.friend = create_user('alice'), create_user('bob')
+        self.viewer.profile.add_friend(self.friend.profile)
+        self.posts = [Post.objects.create(user=self.friend, content=f'post {i}') for i in range(7)]
+        # ties on created_at are broken by the id
+        moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        Post.objects.filter(id__in=[post.id for post in self.posts[2:5]]).update(created_at=moment)
+        for post in self.posts[2:5]:
+            post.feeditem_set.update(created_at=moment)
+
+    def read_newsfeed(self, page_size=3):
+        seen, before = [], None
+        while True:
+            page = list(Profile.objects.get(user=self.viewer).get_newsfeed(before)[:page_size])
+            seen += [post.id for post in page]
+            if len(page) < page_size:
+                return seen
+            last = page[-1]
+            before = decode_cursor(encode_cursor(last.feeditem_set.get(user=self.viewer).created_at, last.id))
+
+    def expected_order(self):
+        return list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_cursor_round_trip(self):
+        moment = datetime(2024, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        self.assertEqual(decode_cursor(encode_cursor(moment, 42)), (moment, 42))
+        for cursor in [None, '', 'x', '1_2_3', '1_x']:
+            self.assertIsNone(decode_cursor(cursor))
+
+    def test_newsfeed_pages_cover_every_post_once(self):
+        self.assertEqual(self.read_newsfeed(), self.expected_order())
+
+    def test_newsfeed_pages_pulled_on_read(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.filter(user=self.friend).update(fanout_on_read=True)
+            bump_versions(('friends', self.viewer.id))
+        self.assertEqual(self.read_newsfeed(), self.expected_order())
+
+    def test_feed_endpoint_follows_the_cursor(self):
+        self.client.force_login(self.viewer)
+        seen, cursor = [], None
+        with self.settings(NEWSFEED_PAGE_SIZE=3):
+            while True:
+                data = self.client.get(reverse('feed'), {'cursor': cursor} if cursor else {}).json()
+                seen += [post['id'] for post in data['posts']]
+                cursor = data['next_cursor']
+                if cursor is None:
+                    break
+        self.assertEqual(seen, self.expected_order())
+
+
+class MessageHistoryPaginationTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer, self.friend = create_user('alice'), create_user('bob')
+        self.message = Message.objects.create(sender=self.viewer, receiver=self.friend)
+        self.contents = [self.message.add_content(self.viewer, f'message {i}') for i in range(5)]
+
+    def test_history_pages(self):
+        newest = list(self.message.get_history()[:2])
+        self.assertEqual(newest, self.contents[:2:-1])
+        older = list(self.message.get_history(before=(newest[-1].created_at, newest[-1].id)))
+        self.assertEqual(older, self.contents[2::-1])
+        since = list(self.message.get_history(since=(self.contents[1].created_at, self.contents[1].id)))
+        self.assertEqual(since, self.contents[2:])
+
+    def test_history_endpoint_follows_the_cursors(self):
+        self.client.force_login(self.friend)
+        url = reverse('message_history', args=[self.message.pk])
+        with self.settings(MESSAGE_PAGE_SIZE=2):
+            page = self.client.get(url).json()
+            self.assertTrue(page['has_more'])
+            self.assertIn('message 4', page['html'])
+            older = self.client.get(url, {'before': page['before']}).json()
+            self.assertIn('message 2', older['html'])
+            self.assertNotIn('message 4', older['html'])
+            self.assertNotIn('message', self.client.get(url, {'since': page['since']}).json()['html'])
+            self.message.add_content(self.viewer, 'message 5')
+            self.assertIn('message 5', self.client.get(url, {'since': page['since']}).json()['html'])
+
+    def test_history_of_other_conversations_is_hidden(self):
+        self.client.force_login(create_user('eve'))
+        self.assertEqual(self.client.get(reverse('message_history', args=[self.message.pk])).status_code, 404)
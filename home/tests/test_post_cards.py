@@ -0,0 +1,48 @@
+from django.urls import reverse
+
+from home.models import Comment, Post
+
+from .base import HomeTestCase, create_user
+
+
+class PostCardCacheTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer, self.friend = create_user('alice'), create_user('bob')
+        self.viewer.profile.add_friend(self.friend.profile)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(user=self.friend, content='first post')
+        self.login(self.viewer)
+
+    def rename(self, user, first_name):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = first_name
+            user.save()
+
+    def test_card_is_rendered_again_after_an_edit(self):
+        url = reverse('userprofile', args=[self.friend.username])
+        self.assertContains(self.client.get(url), 'first post')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.content = 'edited post'
+            self.post.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'edited post')
+        self.assertNotContains(response, 'first post')
+
+    def test_cached_newsfeed_shows_a_renamed_author(self):
+        self.assertContains(self.client.get(reverse('index')), 'Bob Test')
+        self.rename(self.friend, 'Robert')
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Robert Test')
+        self.assertNotContains(response, 'Bob Test')
+
+    def test_cached_post_page_shows_a_renamed_commenter(self):
+        commenter = create_user('carol')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(user=commenter, post=self.post, content='nice')
+        url = reverse('post_detail', args=[self.post.id])
+        self.assertContains(self.client.get(url), 'Carol Test')
+        self.rename(commenter, 'Caroline')
+        response = self.client.get(url)
+        self.assertContains(response, 'Caroline Test')
+        self.assertNotContains(response, 'Carol Test')
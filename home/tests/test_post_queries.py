@@ -0,0 +1,51 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from home.models import Comment, Post, Reaction
+
+from .base import HomeTestCase, create_user
+
+
+class PostCardQueryTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = create_user('alice')
+        self.friends = [create_user(f'friend{i}') for i in range(3)]
+        for friend in self.friends:
+            self.viewer.profile.add_friend(friend.profile)
+        self.client.force_login(self.viewer)
+
+    def add_posts(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                author = self.friends[i % len(self.friends)]
+                post = Post.objects.create(user=author, content=f'post {i}')
+                Comment.objects.create(user=self.friends[(i + 1) % len(self.friends)], post=post, content='nice')
+                Reaction.toggle(self.viewer, post.id, 'like')
+
+    def get(self, url):
+        # without a CSRF cookie the page is rendered rather than served from the cache
+        self.client.cookies.pop('csrftoken', None)
+        return self.client.get(url)
+
+    def count_queries(self, url):
+        # once to load what is kept between requests
+        self.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(url).status_code, 200)
+        return len(queries)
+
+    def assert_queries_per_page_are_fixed(self, url):
+        self.add_posts(2)
+        count = self.count_queries(url)
+        self.add_posts(10)
+        self.get(url)
+        with self.assertNumQueries(count):
+            self.assertContains(self.get(url), 'post 9')
+
+    def test_newsfeed(self):
+        self.assert_queries_per_page_are_fixed(reverse('index'))
+
+    def test_profile(self):
+        self.assert_queries_per_page_are_fixed(reverse('userprofile', args=[self.friends[0].username]))
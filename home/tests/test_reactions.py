@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from home import reactions
+from home.models import Post, Reaction
+from home.reactions import ReactionBuffer
+
+from .base import HomeTestCase, create_user
+
+
+class ReactionBufferTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = os.path.join(directory.name, 'reactions.journal')
+        self.user = create_user('alice')
+        self.post = Post.objects.create(user=create_user('bob'), content='hello')
+
+    def create_buffer(self):
+        # flushed by the tests, the background thread never wakes up
+        buffer = ReactionBuffer(self.journal, flush_interval=3600, flush_size=1000)
+        self.addCleanup(lambda: os.close(buffer.fd))
+        return buffer
+
+    def read_journal(self, buffer):
+        with open(buffer.journal) as journal:
+            return [json.loads(line) for line in journal]
+
+    def test_toggle_is_journaled_before_the_flush(self):
+        buffer = self.create_buffer()
+        self.assertEqual(buffer.toggle(self.user, self.post.id, 'like'), ('like', 1, 0))
+        self.assertEqual(buffer.toggle(self.user, self.post.id, 'dislike'), ('dislike', 0, 1))
+        self.assertEqual(self.read_journal(buffer), [
+            {'user': self.user.id, 'post': self.post.id, 'kind': 'like'},
+            {'user': self.user.id, 'post': self.post.id, 'kind': 'dislike'},
+        ])
+        self.assertFalse(Reaction.objects.exists())
+
+    def test_flush_writes_the_net_effect_and_empties_the_journal(self):
+        buffer = self.create_buffer()
+        for kind in ['like', 'dislike', 'dislike', 'like']:
+            buffer.toggle(self.user, self.post.id, kind)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(list(Reaction.objects.values_list('user_id', 'kind')), [(self.user.id, 'like')])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.dislike_count), (1, 0))
+        self.assertEqual(self.read_journal(buffer), [])
+
+    def test_failed_flush_is_retried(self):
+        buffer = self.create_buffer()
+        buffer.toggle(self.user, self.post.id, 'like')
+        with mock.patch.object(reactions, 'apply_reactions', side_effect=RuntimeError('disk I/O error')), \
+                self.assertLogs('home.reactions', 'ERROR'):
+            # what the background thread runs, it must survive to try again
+            buffer.try_flush()
+        self.assertFalse(Reaction.objects.exists())
+        self.assertEqual(len(self.read_journal(buffer)), 1)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertTrue(Reaction.objects.filter(user=self.user, post=self.post, kind='like').exists())
+
+    def test_dead_thread_is_restarted(self):
+        buffer = self.create_buffer()
+        buffer.thread = mock.Mock(is_alive=mock.Mock(return_value=False))
+        with mock.patch('threading.Thread') as thread:
+            buffer.start()
+        thread.return_value.start.assert_called_once_with()
+        self.assertIs(buffer.thread, thread.return_value)
+
+    def test_flushed_reactions_are_reloaded(self):
+        buffer = self.create_buffer()
+        buffer.toggle(self.user, self.post.id, 'like')
+        buffer.flush()
+        # removed through another process
+        Reaction.toggle(self.user, self.post.id, 'like')
+        self.assertEqual(buffer.toggle(self.user, self.post.id, 'like'), ('like', 1, 0))
+
+    def test_orphaned_journals_are_replayed(self):
+        # left behind by a process that stopped before flushing
+        with open(f'{self.journal}.999-0', 'w') as journal:
+            journal.write(json.dumps({'user': self.user.id, 'post': self.post.id, 'kind': 'like'}) + '\n')
+            journal.write('{"user": ')
+        self.create_buffer()
+        self.assertTrue(Reaction.objects.filter(user=self.user, post=self.post, kind='like').exists())
+        self.assertFalse(os.path.exists(f'{self.journal}.999-0'))
+
+    @unittest.skipIf(reactions.fcntl is None, 'journals can only be locked with fcntl')
+    def test_journals_of_running_buffers_are_not_replayed(self):
+        running = self.create_buffer()
+        running.toggle(self.user, self.post.id, 'like')
+        self.create_buffer()
+        self.assertFalse(Reaction.objects.exists())
+        self.assertEqual(len(self.read_journal(running)), 1)
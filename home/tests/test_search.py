@@ -0,0 +1,86 @@
+from django.urls import reverse
+
+from home.models import Comment, Post
+from home.search import POSTS_TABLE, index_user, is_available, search_posts, search_users
+
+from .base import HomeTestCase, create_user
+
+
+class PeopleSearchTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        if not is_available():
+            self.skipTest('the people index needs SQLite with FTS5')
+        self.users = {}
+        for username, first_name, last_name in [('jdoe', 'John', 'Doe'), ('johnny', 'Johnny', 'Walker'),
+                                                ('mjohnson', 'Mary', 'Johnson'), ('alice', 'Alice', 'Smith')]:
+            self.users[username] = create_user(username, first_name=first_name, last_name=last_name)
+            index_user(self.users[username])
+
+    def search(self, query):
+        usernames = {user.id: username for username, user in self.users.items()}
+        return [usernames[user_id] for user_id in search_users(query)]
+
+    def test_names_starting_with_the_query_rank_first(self):
+        results = self.search('john')
+        self.assertEqual(set(results), {'jdoe', 'johnny', 'mjohnson'})
+        self.assertEqual(results[-1], 'mjohnson')
+
+    def test_typos_still_match(self):
+        self.assertEqual(self.search('Jonson')[:1], ['mjohnson'])
+        self.assertIn('alice', self.search('Alice Smiht'))
+
+    def test_short_queries_match_name_prefixes(self):
+        self.assertEqual(set(self.search('jo')), {'johnny', 'jdoe', 'mjohnson'})
+
+    def test_renames_are_indexed(self):
+        user = self.users['alice']
+        user.last_name = 'Brown'
+        user.save()
+        index_user(user)
+        self.assertEqual(self.search('brown'), ['alice'])
+
+    def test_search_page_lists_the_results(self):
+        self.client.force_login(self.users['alice'])
+        response = self.client.get(reverse('search'), {'q': 'johnson'})
+        self.assertEqual([user.username for user in response.context['results']], ['mjohnson'])
+
+
+class PostSearchTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        if not is_available(POSTS_TABLE):
+            self.skipTest('the post index needs SQLite with FTS5')
+        self.viewer, self.friend, self.stranger = create_user('alice'), create_user('bob'), create_user('carol')
+        self.viewer.profile.add_friend(self.friend.profile)
+
+    def search(self, query, **kwargs):
+        ids, has_next = search_posts(self.viewer, query, **kwargs)
+        return [Post.objects.get(pk=post_id).content for post_id in ids], has_next
+
+    def test_only_posts_visible_to_the_viewer_are_found(self):
+        for user in [self.viewer, self.friend, self.stranger]:
+            for visibility in ['public', 'friends']:
+                Post.objects.create(user=user, content=f'holiday by {user.username} for {visibility}',
+                                    visibility=visibility)
+        results, _ = self.search('holiday')
+        self.assertEqual(sorted(results), ['holiday by alice for friends', 'holiday by alice for public',
+                                           'holiday by bob for friends', 'holiday by bob for public',
+                                           'holiday by carol for public'])
+
+    def test_posts_are_found_through_their_comments(self):
+        post = Post.objects.create(user=self.stranger, content='pictures', visibility='friends')
+        Comment.objects.create(user=self.stranger, post=post, content='what a sunset')
+        self.assertEqual(self.search('sunset'), ([], False))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer.profile.add_friend(self.stranger.profile)
+        self.assertEqual(self.search('suns'), (['pictures'], False))
+
+    def test_pages(self):
+        for i in range(5):
+            Post.objects.create(user=self.stranger, content=f'match {i}')
+        first, has_next = self.search('match', page_size=3)
+        self.assertTrue(has_next)
+        second, has_next = self.search('match', page=2, page_size=3)
+        self.assertFalse(has_next)
+        self.assertEqual(sorted(first + second), [f'match {i}' for i in range(5)])
@@ -0,0 +1,38 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .base import HomeTestCase, create_user
+
+
+class SessionStorageTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('alice')
+
+    def get_session_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']]
+
+    def test_sessions_are_read_from_the_cache(self):
+        self.assertTrue(self.client.login(username='alice@example.com', password='password'))
+        response, queries = self.get_session_queries(reverse('friends'))
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual(queries, [])
+
+    def test_logout_ends_the_cached_session(self):
+        self.client.login(username='alice', password='password')
+        self.client.get(reverse('friends'))
+        self.client.get(reverse('logout'))
+        response = self.client.get(reverse('profile'))
+        self.assertRedirects(response, '/login/?next=/profile/', fetch_redirect_response=False)
+
+    def test_flash_messages_are_kept_in_a_cookie(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('index'), {'new_post': '', 'content': 'hello', 'visibility': 'public'})
+        self.assertIn('messages', response.cookies)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')])
+        self.assertContains(self.client.get(response.url), 'Post created successfully!')
@@ -0,0 +1,67 @@
+from array import array
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from home.models import Profile
+from home.suggestions import load_graph, suggest
+
+from .base import HomeTestCase, create_user
+
+
+class SuggestTests(SimpleTestCase):
+    def setUp(self):
+        # 1 is friends with 2 and 3, who share 4, and 3 also knows 5
+        edges = {1: [2, 3], 2: [1, 4], 3: [1, 4, 5], 4: [2, 3], 5: [3]}
+        self.graph = {profile_id: array('q', friends) for profile_id, friends in edges.items()}
+
+    def test_ranks_by_mutual_friends(self):
+        self.assertEqual(suggest(self.graph, 1, 10), [(4, 2), (5, 1)])
+
+    def test_skips_friends_and_the_profile_itself(self):
+        self.assertEqual(suggest(self.graph, 4, 10), [(1, 2), (5, 1)])
+
+    def test_ties_go_to_the_oldest_profile(self):
+        self.assertEqual(suggest(self.graph, 2, 10), [(3, 2)])
+        self.assertEqual(suggest(self.graph, 5, 1), [(1, 1)])
+
+    def test_profiles_without_friends_get_none(self):
+        self.assertEqual(suggest(self.graph, 6, 10), [])
+
+
+class ComputeSuggestionsTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        users = [create_user(name) for name in ['alice', 'bob', 'carol', 'dave', 'erin']]
+        self.profiles = [Profile.objects.get(user=user) for user in users]
+        alice, bob, carol, dave, erin = self.profiles
+        for profile, friend in [(alice, bob), (alice, carol), (bob, dave), (carol, dave), (carol, erin)]:
+            profile.add_friend(friend)
+
+    def get_suggestions(self, profile):
+        profile = Profile.objects.get(pk=profile.pk)
+        return [(suggestion.candidate, suggestion.mutual_count) for suggestion in profile.get_suggestions()]
+
+    def test_partial_graph_scores_like_the_full_one(self):
+        alice, carol = self.profiles[0].pk, self.profiles[2].pk
+        full, partial = load_graph(), load_graph([alice, carol], batch_size=1)
+        for profile_id in [alice, carol]:
+            self.assertEqual(suggest(partial, profile_id, 10), suggest(full, profile_id, 10))
+
+    def test_stale_profiles_are_computed_in_batches(self):
+        alice, bob, carol, dave, erin = self.profiles
+        call_command('compute_suggestions', batch_size=2, stdout=StringIO())
+        self.assertFalse(Profile.objects.filter(suggestions_stale=True).exists())
+        self.assertEqual(self.get_suggestions(alice), [(dave, 2), (erin, 1)])
+        # the users around a new friendship only
+        alice.add_friend(dave)
+        self.assertEqual(set(Profile.objects.filter(suggestions_stale=True)), {alice, bob, carol, dave})
+        call_command('compute_suggestions', batch_size=2, stdout=StringIO())
+        self.assertEqual(self.get_suggestions(alice), [(erin, 1)])
+
+    def test_befriended_suggestions_are_skipped(self):
+        alice, bob, carol, dave, erin = self.profiles
+        call_command('compute_suggestions', stdout=StringIO())
+        Profile.objects.get(pk=alice.pk).add_friend(erin)
+        self.assertEqual(self.get_suggestions(alice), [(dave, 2)])
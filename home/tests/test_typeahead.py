@@ -0,0 +1,48 @@
+from django.urls import reverse
+
+from home.typeahead import TypeaheadIndex, build_typeahead_index
+
+from .base import HomeTestCase, create_user
+
+
+class TypeaheadTests(HomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = create_user('alice', first_name='Alice', last_name='Smith')
+        self.users = [create_user(username, first_name=first_name, last_name=last_name)
+                      for username, first_name, last_name in [('adam', 'Adam', 'Jones'), ('albert', 'Albert', 'Stone'),
+                                                              ('zoe', 'Zoe', 'Allen')]]
+        self.index = TypeaheadIndex()
+        self.index.build()
+
+    def complete(self, prefix, **kwargs):
+        return [username for _, username, _ in self.index.complete(prefix, **kwargs)]
+
+    def test_any_name_term_matches_the_prefix(self):
+        self.assertEqual(self.complete('al'), ['albert', 'alice', 'zoe'])
+        self.assertEqual(self.complete('Zoe Al'), ['zoe'])
+        self.assertEqual(self.complete('x'), [])
+        self.assertEqual(self.complete('  '), [])
+
+    def test_friends_come_first(self):
+        adam, albert, zoe = self.users
+        self.assertEqual(self.complete('a', boost={zoe.id}, limit=2), ['zoe', 'adam'])
+
+    def test_excluded_users_do_not_take_a_slot(self):
+        self.assertEqual(self.complete('al', exclude={self.viewer.id}, limit=2), ['albert', 'zoe'])
+
+    def test_renames_replace_the_terms(self):
+        adam = self.users[0]
+        self.assertEqual(self.complete('adam j'), ['adam'])
+        adam.first_name = 'Bob'
+        self.index.update(adam)
+        self.assertEqual(self.complete('adam j'), [])
+        self.assertEqual(self.complete('bob j'), ['adam'])
+
+    def test_endpoint(self):
+        build_typeahead_index()
+        self.viewer.profile.add_friend(self.users[2].profile)
+        self.client.force_login(self.viewer)
+        results = self.client.get(reverse('typeahead'), {'q': 'al'}).json()['results']
+        self.assertEqual([(result['username'], result['is_friend']) for result in results],
+                         [('zoe', True), ('albert', False)])
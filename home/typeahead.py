@@ -0,0 +1,146 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+
+
+class TypeaheadIndex:
+    """
+    Sorted array of lowercase name terms (username, full name and last name)
+    for prefix lookups with bisect. Kept in memory per process, updated in place
+    on signups and renames and rebuilt in the background every TYPEAHEAD_REFRESH
+    seconds to pick up changes made by other processes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.terms = []
+        # user id -> (username, full name, ' username full name' lowercased)
+        self.users = {}
+        self.built_at = None
+        # users added or renamed while a build runs, applied to the new index too
+        self.added = None
+
+    @staticmethod
+    def get_terms(username, full_name):
+        terms = {username.lower(), full_name.lower()}
+        if ' ' in full_name:
+            terms.add(full_name.rsplit(' ', 1)[1].lower())
+        terms.discard('')
+        return terms
+
+    @staticmethod
+    def entry(username, full_name):
+        return username, full_name, f' {username} {full_name}'.lower()
+
+    @staticmethod
+    def replace(terms, users, user_id, username, full_name):
+        # drop the terms of the previous names, then add the current ones
+        if user_id in users:
+            for term in TypeaheadIndex.get_terms(*users[user_id][:2]):
+                index = bisect_left(terms, (term, user_id))
+                if index < len(terms) and terms[index] == (term, user_id):
+                    del terms[index]
+        users[user_id] = TypeaheadIndex.entry(username, full_name)
+        for term in TypeaheadIndex.get_terms(username, full_name):
+            insort(terms, (term, user_id))
+
+    def build(self):
+        with self.lock:
+            self.added = []
+        users = {}
+        terms = []
+        for user_id, username, first_name, last_name in User.objects.values_list(
+                'id', 'username', 'first_name', 'last_name').iterator():
+            full_name = f'{first_name} {last_name}'.strip()
+            users[user_id] = self.entry(username, full_name)
+            terms.extend((term, user_id) for term in self.get_terms(username, full_name))
+        terms.sort()
+        with self.lock:
+            for added in self.added:
+                self.replace(terms, users, *added)
+            self.terms, self.users = terms, users
+            self.added = None
+            self.built_at = time.monotonic()
+
+    def update(self, user):
+        """
+        Add a user, or replace its terms after a rename.
+        """
+        added = (user.id, user.username, user.get_full_name())
+        with self.lock:
+            if self.built_at is not None:
+                self.replace(self.terms, self.users, *added)
+            if self.added is not None:
+                self.added.append(added)
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > getattr(settings, 'TYPEAHEAD_REFRESH', 300)
+
+    def matches(self, user_id, prefix):
+        # any word of the username or full name starting with the prefix
+        return ' ' + prefix in self.users[user_id][2]
+
+    def complete(self, prefix, limit=8, boost=(), exclude=()):
+        """
+        Return up to limit (user id, username, full name) tuples with a name term
+        starting with prefix, skipping the users in exclude. Users in boost (the
+        viewer's friends) come first.
+        """
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        with self.lock:
+            found = sorted((user_id for user_id in boost if user_id in self.users and user_id not in exclude
+                            and self.matches(user_id, prefix)), key=lambda user_id: self.users[user_id][0])[:limit]
+            seen = set(found)
+            seen.update(exclude)
+            index = bisect_left(self.terms, (prefix,))
+            while len(found) < limit and index < len(self.terms):
+                term, user_id = self.terms[index]
+                if not term.startswith(prefix):
+                    break
+                if user_id not in seen:
+                    seen.add(user_id)
+                    found.append(user_id)
+                index += 1
+            return [(user_id,) + self.users[user_id][:2] for user_id in found]
+
+
+_index = TypeaheadIndex()
+_build_lock = threading.Lock()
+
+
+def get_typeahead_index():
+    """
+    Get the process-wide typeahead index, None until it is first built. Stale
+    indexes are rebuilt in a background thread, requests keep using the
+    previous one meanwhile.
+    """
+    if _index.is_stale() and _build_lock.acquire(blocking=False):
+        threading.Thread(target=build_in_background, name='typeahead', daemon=True).start()
+    return _index if _index.built_at is not None else None
+
+
+def build_typeahead_index():
+    """
+    Build the typeahead index in the calling thread.
+    """
+    with _build_lock:
+        _index.build()
+
+
+def build_in_background():
+    close_old_connections()
+    try:
+        _index.build()
+    finally:
+        close_old_connections()
+        _build_lock.release()
+
+
+def update_typeahead(user):
+    _index.update(user)
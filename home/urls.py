@@ -3,18 +3,23 @@ from . import views
 
 urlpatterns = [
     path('', views.HomeView.as_view(), name='index'),
+    path('feed/', views.FeedView.as_view(), name='feed'),
     path('login/', views.LoginView.as_view(), name='login'),
     path('', views.HomeView.as_view(), name='forgot'),
     path('signup/', views.SignUpView.as_view(), name='signup'),
     path('search', views.SearchView.as_view(), name='search'),
+    path('search/typeahead/', views.TypeaheadView.as_view(), name='typeahead'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('profile/<str:user_name>', views.ProfileView.as_view(), name='userprofile'),
     path('profile/<str:user_name>/edit', views.ProfileEditView.as_view(), name='edit_profile'),
     path('logout/', views.logout_view, name='logout'),
     path('post/<int:post_id>/', views.PostView.as_view(), name='post_detail'),
     path('post/<int:pk>/edit/', views.PostEditView.as_view(), name='post_edit'),
+    path('post/<int:post_id>/react/', views.ReactionView.as_view(), name='post_react'),
     path('friends/', views.FriendListView.as_view(), name='friends'),
     path('messages/', views.MessageListView.as_view(), name='messages'),
     path('messages/<int:pk>/', views.MessageDetailView.as_view(), name='message_detail'),
+    path('messages/<int:pk>/history/', views.MessageHistoryView.as_view(), name='message_history'),
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache_stats'),
     path('newmessage/', views.NewMessageView.as_view(), name='new_message'),
 ]
@@ -4,15 +4,23 @@ from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.mixins import UserPassesTestMixin
-from django.core.files.storage import FileSystemStorage
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
 from django.shortcuts import render, redirect, get_object_or_404, HttpResponse, HttpResponseRedirect
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy, reverse
 from django.views import View, generic
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 
+from .accounts import email_taken, username_taken
+from .blobs import get_default_blob, set_blob
+from .cache import CachedViewMixin, get_stats
 from .forms import *
-from .models import Post, Profile, FriendRequests, Message, MessageContent
+from .models import Post, Profile, FriendRequests, Message, Reaction
+from .pagination import EPOCH, encode_cursor, decode_cursor, get_page_size
+from .reactions import get_reaction_buffer
+from .realtime import read_conversation, send_message
+from .search import complete_users, index_user, search_posts, search_users
 
 
 # Helper functions
@@ -33,16 +41,20 @@ def new_post_function(request):
 def new_profile_function(user, form):
     new_profile = Profile(user=user)
     new_profile.birth_date = form.cleaned_data.get('birth_date')
-    random_cover = random.randint(1, 8)
-    fs = FileSystemStorage()
-    fs.save(f'user_{user.username}_{user.id}/cp/cover{random_cover}.svg',
-            open('static/img/covers/cover' + str(random_cover) + '.svg', 'rb'))
-    new_profile.cover_pic = f'user_{user.username}_{user.id}/cp/cover{random_cover}.svg'
-    random_pp = random.randint(1, 8)
-    fs.save(f'user_{user.username}_{user.id}/pp/avatar{random_pp}.png',
-            open('static/img/avatar/avatar' + str(random_pp) + '.png', 'rb'))
-    new_profile.profile_pic = f'user_{user.username}_{user.id}/pp/avatar{random_pp}.png'
+    # shared with every user who got the same picture, nothing is copied
+    set_blob(new_profile, 'cover_pic', get_default_blob(f'static/img/covers/cover{random.randint(1, 8)}.svg'))
+    set_blob(new_profile, 'profile_pic', get_default_blob(f'static/img/avatar/avatar{random.randint(1, 8)}.png'))
     new_profile.save()
+    index_user(user)
+
+
+def save_form_fields(form):
+    # only what the form edits: the instance can be the user or profile cached
+    # with the session (see EmailBackend.get_user), older than the row
+    instance = form.save(commit=False)
+    columns = {field.name for field in instance._meta.concrete_fields}
+    instance.save(update_fields=[name for name in form.fields if name in columns])
+    return instance
 
 
 def post_delete_function(request, post_id):
@@ -55,49 +67,88 @@ def post_delete_function(request, post_id):
 
 
 def post_like_dislike_function(request, post_id, action):
-    post = get_object_or_404(Post, id=post_id)
-    like_class = 'text-muted'
-    dislike_class = 'text-muted'
-    if action == 'like':
-        if post.dislikes.filter(id=request.user.id).exists():
-            post.dislikes.remove(request.user)
-            dislike_class = 'text-muted'
-        if post.likes.filter(id=request.user.id).exists():
-            post.likes.remove(request.user)
-            like_class = 'text-muted'
-        else:
-            post.likes.add(request.user)
-            like_class = 'text-primary'
-    elif action == 'dislike':
-        if post.likes.filter(id=request.user.id).exists():
-            post.likes.remove(request.user)
-            like_class = 'text-muted'
-        if post.dislikes.filter(id=request.user.id).exists():
-            post.dislikes.remove(request.user)
-            dislike_class = 'text-muted'
-        else:
-            post.dislikes.add(request.user)
-            dislike_class = 'text-primary'
+    if action not in Reaction.COUNTERS:
+        return JsonResponse({'status': 'error'}, status=400)
+    buffer = get_reaction_buffer()
+    toggle = buffer.toggle if buffer is not None else Reaction.toggle
+    try:
+        reaction, likes, dislikes = toggle(request.user, post_id, action)
+    except (Post.DoesNotExist, ValueError):
+        raise Http404('Post does not exist.')
     data = {
-        'likes': post.likes.count(),
-        'dislikes': post.dislikes.count(),
-        'like_class': like_class,
-        'dislike_class': dislike_class
+        'likes': likes,
+        'dislikes': dislikes,
+        'like_class': 'text-primary' if reaction == 'like' else 'text-muted',
+        'dislike_class': 'text-primary' if reaction == 'dislike' else 'text-muted'
     }
     return JsonResponse(data)
+
+
+def newsfeed_page(request, cursor=None):
+    # fetch one extra post to know whether there is a next page
+    size = get_page_size(request, 'NEWSFEED_PAGE_SIZE')
+    posts = request.user.profile.get_newsfeed(before=decode_cursor(cursor)).with_details(request.user)
+    posts = list(posts[:size + 1])
+    next_cursor = None
+    if len(posts) > size:
+        posts = posts[:size]
+        next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+    return posts, next_cursor
+
+
+def get_newsfeed_versions(request, cursor=None):
+    # posts delivered to the feed bump it, the ones of friends read on demand their author's posts
+    user = request.user
+    versions = [('friends', user.pk), ('feed', user.pk),
+                *[('posts', author_id) for author_id in user.profile.get_pulled_ids()]]
+    # and the names and photos of the authors on the page
+    size = get_page_size(request, 'NEWSFEED_PAGE_SIZE')
+    authors = user.profile.get_newsfeed(before=decode_cursor(cursor)).values_list('user_id', flat=True)[:size]
+    return versions + [('user', author_id) for author_id in sorted(set(authors))]
+
+
+def message_history_context(request, message, before=None, since=None):
+    # fetch one extra message to know whether there are more
+    size = get_page_size(request, 'MESSAGE_PAGE_SIZE')
+    history = list(message.get_history(before=before, since=since)[:size + 1])
+    has_more = len(history) > size
+    history = history[:size]
+    if since is None:
+        history.reverse()
+    newest = (history[-1].created_at, history[-1].id) if history else since
+    role = message.get_role(request.user)
+    return {
+        'history': history,
+        'has_more': has_more,
+        # older page to load when scrolling back, newest message to poll from
+        'before_cursor': encode_cursor(history[0].created_at, history[0].id) if has_more and since is None else None,
+        'since_cursor': encode_cursor(*(newest or (EPOCH, 0))),
+        'role': role,
+        'other': message.receiver if role == 'sender' else message.sender,
+    }
+
+
+def home_context(request):
+    newsfeed, next_cursor = newsfeed_page(request)
+    return {
+        'active': 'home',
+        'search_form': SearchForm(),
+        'post_form': PostForm(),
+        'newsfeed': newsfeed,
+        'next_cursor': next_cursor,
+    }
 ######
 
 
-class HomeView(View):
+class HomeView(CachedViewMixin, View):
+    @staticmethod
+    def get_cache_versions(request, **kwargs):
+        return get_newsfeed_versions(request)
+
     @staticmethod
     def get(request):
         if request.user.is_authenticated:
-            context = {
-                'active': 'home',
-                'search_form': SearchForm(),
-                'post_form': PostForm(),
-            }
-            return render(request, 'home/index.html', context)
+            return render(request, 'home/index.html', home_context(request))
         else:
             context = {
                 'login_form': LoginForm(),
@@ -115,12 +166,7 @@ class HomeView(View):
                 user = authenticate(username=email, password=password)
                 if user is not None:
                     login(request, user)
-                    context = {
-                        'active': 'home',
-                        'search_form': SearchForm(),
-                        'post_form': PostForm()
-                    }
-                    return render(request, 'home/index.html', context)
+                    return render(request, 'home/index.html', home_context(request))
                 else:
                     context = {
                         'login_form': LoginForm(),
@@ -135,11 +181,11 @@ class HomeView(View):
             signup_form = SignUpForm(request.POST)
             if signup_form.is_valid():
                 # check if email is taken
-                if User.objects.filter(email=signup_form.cleaned_data['email']).exists():
+                if email_taken(signup_form.cleaned_data['email']):
                     messages.error(request, 'Email already exists')
                     return render(request, 'landing/index.html', {'signup_form': signup_form})
                 # check if username is taken
-                if User.objects.filter(username=signup_form.cleaned_data['username']).exists():
+                if username_taken(signup_form.cleaned_data['username']):
                     messages.error(request, 'Username already exists')
                     return render(request, 'landing/index.html', {'signup_form': signup_form})
                 # check if age is valid
@@ -147,9 +193,15 @@ class HomeView(View):
                     messages.error(request, 'You must be at least 18 years old')
                     return render(request, 'landing/index.html', {'signup_form': signup_form})
                 # create user
-                user = User.objects.create_user(username=signup_form.cleaned_data['username'],
-                                                email=signup_form.cleaned_data['email'],
-                                                password=signup_form.cleaned_data['password'])
+                try:
+                    with transaction.atomic():
+                        user = User.objects.create_user(username=signup_form.cleaned_data['username'],
+                                                        email=signup_form.cleaned_data['email'],
+                                                        password=signup_form.cleaned_data['password'])
+                except IntegrityError:
+                    # registered by a concurrent signup since the checks
+                    messages.error(request, 'Email or username already exists')
+                    return render(request, 'landing/index.html', {'signup_form': signup_form})
                 user.first_name = signup_form.cleaned_data['first_name']
                 user.last_name = signup_form.cleaned_data['last_name']
                 user.save()
@@ -157,18 +209,45 @@ class HomeView(View):
                 new_profile_function(user, signup_form)
                 # login user
                 login(request, user)
-                context = {
-                    'active': 'home',
-                    'search_form': SearchForm(),
-                    'post_form': PostForm()
-                }
-                return render(request, 'home/index.html', context)
+                return render(request, 'home/index.html', home_context(request))
         elif 'post_delete_id' in request.POST:
             return post_delete_function(request, request.POST['post_delete_id'])
         elif 'post_like_dislike_id' in request.POST:
             return post_like_dislike_function(request, request.POST['post_like_dislike_id'], request.POST['action'])
 
 
+class FeedView(CachedViewMixin, View):
+    @staticmethod
+    def get_cache_versions(request, **kwargs):
+        return get_newsfeed_versions(request, request.GET.get('cursor'))
+
+    @staticmethod
+    def get(request):
+        if request.user.is_authenticated:
+            newsfeed, next_cursor = newsfeed_page(request, request.GET.get('cursor'))
+            if request.GET.get('format') == 'html':
+                return render(request, 'home/feed_page.html', {'newsfeed': newsfeed, 'next_cursor': next_cursor})
+            data = {
+                'posts': [{
+                    'id': post.id,
+                    'url': reverse('post_detail', args=[post.id]),
+                    'username': post.user.username,
+                    'full_name': post.user.get_full_name(),
+                    'content': post.content,
+                    'attachment': post.attachment.url if post.attachment else None,
+                    'visibility': post.visibility,
+                    'created_at': post.created_at.isoformat(),
+                    'likes': post.get_like_count(),
+                    'dislikes': post.get_dislike_count(),
+                    'comments': post.get_comment_count(),
+                } for post in newsfeed],
+                'next_cursor': next_cursor,
+            }
+            return JsonResponse(data)
+        else:
+            return HttpResponseRedirect('/login/?next=/')
+
+
 class LoginView(auth_views.LoginView):
     template_name = 'landing/login.html'
     form_class = LoginForm
@@ -192,7 +271,17 @@ def logout_view(request):
     return redirect('/')
 
 
-class ProfileView(View):
+class ProfileView(CachedViewMixin, View):
+    @staticmethod
+    def get_cache_versions(request, user_name=None):
+        if user_name is not None and user_name == request.user.username:
+            user_id = request.user.id
+        else:
+            user_id = User.objects.filter(username=user_name).values_list('id', flat=True).first() if user_name else None
+        if user_id is None:
+            return None
+        return [('user', user_id), ('posts', user_id), ('friends', user_id)]
+
     @staticmethod
     def get(request, user_name=None):
         if request.user.is_authenticated:
@@ -203,10 +292,14 @@ class ProfileView(View):
             cover_form = ProfileCoverChangeForm()
             photo_form = ProfilePhotoChangeForm()
             post_form = PostForm()
-            user = get_object_or_404(request.user.__class__, username=user_name)
+            # the viewer comes with their profile already (see EmailBackend.get_user)
+            if user_name == request.user.username:
+                user = request.user
+            else:
+                user = get_object_or_404(User.objects.select_related('profile'), username=user_name)
             if user != request.user:
                 nav_active = ''
-            posts = user.post_set.all().order_by('-created_at')
+            posts = user.post_set.with_details(request.user).order_by('-created_at')
             return render(request, 'profile/profile.html',
                           {'active': nav_active, 'search_form': search_form, 'user': user, 'cover_form': cover_form,
                            'photo_form': photo_form, 'post_form': post_form, 'posts': posts})
@@ -220,7 +313,7 @@ class ProfileView(View):
             if cover_form.is_valid():
                 user = request.user
                 user.profile.cover_pic = cover_form.cleaned_data['cover']
-                user.profile.save()
+                user.profile.save(update_fields=['cover_pic'])
                 messages.success(request, 'Cover updated successfully')
                 return HttpResponseRedirect('/profile/')
             else:
@@ -231,7 +324,7 @@ class ProfileView(View):
             if photo_form.is_valid():
                 user = request.user
                 user.profile.profile_pic = photo_form.cleaned_data['photo']
-                user.profile.save()
+                user.profile.save(update_fields=['profile_pic'])
                 messages.success(request, 'Profile photo updated successfully')
                 return HttpResponseRedirect('/profile/')
             else:
@@ -268,8 +361,9 @@ class ProfileEditView(View):
             user_form = UserEditForm(request.POST, instance=request.user)
             profile_form = ProfileEditForm(request.POST, request.FILES, instance=request.user.profile)
             if user_form.is_valid() and profile_form.is_valid():
-                user_form.save()
-                profile_form.save()
+                save_form_fields(user_form)
+                save_form_fields(profile_form)
+                index_user(request.user)
                 messages.success(request, 'Profile updated successfully')
                 return HttpResponseRedirect('/profile/')
             else:
@@ -285,15 +379,31 @@ class SearchView(View):
             search_form = SearchForm()
             search_query = request.GET.get('q')
             search_form.fields['q'].initial = search_query
-            friend_requests = FriendRequests.objects.filter(receiver_user=request.user)
-            friend_requests_usernames = [friend_request.sender_user.username for friend_request in friend_requests]
+            friend_requests_usernames = set(FriendRequests.objects.filter(
+                receiver_user=request.user).values_list('sender_user__username', flat=True))
+            sent_requests_usernames = set(FriendRequests.objects.filter(
+                sender_user=request.user).values_list('receiver_user__username', flat=True))
+            if search_query is not None and request.GET.get('type') == 'posts':
+                try:
+                    page = max(int(request.GET.get('page', 1)), 1)
+                except ValueError:
+                    page = 1
+                ids, has_next = search_posts(request.user, search_query, page)
+                posts = Post.objects.with_details(request.user).in_bulk(ids)
+                return render(request, 'home/search.html',
+                              {'active': 'search', 'search_form': search_form, 'search_type': 'posts',
+                               'posts': [posts[post_id] for post_id in ids if post_id in posts],
+                               'page': page, 'has_next': has_next})
             if search_query is not None:
-                results = User.objects.filter(Q(username__icontains=search_query) |
-                                              Q(first_name__icontains=search_query) |
-                                              Q(last_name__icontains=search_query))
+                ids = search_users(search_query)
+                results = User.objects.filter(id__in=ids).select_related('profile').annotate(
+                    friends_total=Count('profile__friends')).in_bulk()
+                # keep the ranking of the search index
+                results = [results[user_id] for user_id in ids if user_id in results]
                 return render(request, 'home/search.html',
                               {'active': 'search', 'search_form': search_form, 'results': results,
-                               'friend_requests_usernames': friend_requests_usernames})
+                               'friend_requests_usernames': friend_requests_usernames,
+                               'sent_requests_usernames': sent_requests_usernames})
 
             return render(request, 'home/search.html', {'search_form': search_form})
         else:
@@ -325,6 +435,19 @@ class SearchView(View):
             return JsonResponse(data)
 
 
+class TypeaheadView(View):
+    @staticmethod
+    def get(request):
+        if request.user.is_authenticated:
+            friend_ids = request.user.profile.get_friend_ids()
+            matches = complete_users(request.GET.get('q', ''), boost=friend_ids, exclude={request.user.id})
+            results = [{'username': username, 'full_name': full_name, 'is_friend': user_id in friend_ids}
+                       for user_id, username, full_name in matches]
+            return JsonResponse({'status': 'success', 'results': results})
+        else:
+            return JsonResponse({'status': 'error'}, status=403)
+
+
 class SignUpView(UserPassesTestMixin, generic.CreateView):
     form_class = SignUpForm
     success_url = reverse_lazy('login')
@@ -335,11 +458,11 @@ class SignUpView(UserPassesTestMixin, generic.CreateView):
     def form_valid(self, form):
         is_error = False
         # check if email is already registered
-        if form.cleaned_data['email'] in [user.email for user in User.objects.all()]:
+        if email_taken(form.cleaned_data['email']):
             form.add_error('email', 'Email already registered')
             is_error = True
         # check if username is already registered
-        if form.cleaned_data['username'] in [user.username for user in User.objects.all()]:
+        if username_taken(form.cleaned_data['username']):
             form.add_error('username', 'Username already registered')
             is_error = True
         # check if age is valid
@@ -349,7 +472,13 @@ class SignUpView(UserPassesTestMixin, generic.CreateView):
             is_error = True
         if is_error:
             return super().form_invalid(form)
-        user = form.save()
+        try:
+            with transaction.atomic():
+                user = form.save()
+        except IntegrityError:
+            # registered by a concurrent signup since the checks
+            form.add_error(None, 'Email or username already registered')
+            return super().form_invalid(form)
         new_profile_function(user, form)
         login(self.request, user)
         return super().form_valid(form)
@@ -363,14 +492,21 @@ class SignUpView(UserPassesTestMixin, generic.CreateView):
         return redirect('index')
 
 
-class PostView(View):
+class PostView(CachedViewMixin, View):
+    @staticmethod
+    def get_cache_versions(request, post_id):
+        # the post, and the names and photos of its author and commenters
+        users = Post.objects.filter(pk=post_id).values_list('user_id', 'comment__user_id')
+        user_ids = {user_id for row in users for user_id in row if user_id is not None}
+        return [('post', post_id), *[('user', user_id) for user_id in sorted(user_ids)]]
+
     @staticmethod
     def get(request, post_id):
         if request.user.is_authenticated:
             context = {
                 'search_form': SearchForm(),
                 'comment_form': CommentForm(),
-                'post': Post.objects.get(id=post_id),
+                'post': Post.objects.with_details(request.user).get(id=post_id),
             }
             return render(request, 'post/post_detail.html', context)
         else:
@@ -392,6 +528,15 @@ class PostView(View):
                 return HttpResponseRedirect('/post/' + str(post_id))
 
 
+class ReactionView(View):
+    @staticmethod
+    def post(request, post_id):
+        if request.user.is_authenticated:
+            return post_like_dislike_function(request, post_id, request.POST.get('action'))
+        else:
+            return HttpResponseRedirect('/login/?next=/post/' + str(post_id))
+
+
 class PostEditView(UserPassesTestMixin, generic.UpdateView):
     model = Post
     form_class = PostForm
@@ -425,8 +570,10 @@ class FriendListView(View):
             context = {
                 'active': 'friends',
                 'search_form': SearchForm(),
-                'friends': request.user.profile.friends.all(),
+                'friends': request.user.profile.friends.select_related('user').annotate(
+                    friends_total=Count('friends')),
                 'friend_requests': FriendRequests.objects.filter(receiver_user=request.user),
+                'suggestions': request.user.profile.get_suggestions(),
             }
             return render(request, 'friends.html', context)
         else:
@@ -475,8 +622,8 @@ class MessageListView(UserPassesTestMixin, generic.ListView):
         return redirect('index')
 
     def get_queryset(self):
-        return Message.objects.filter(Q(sender=self.request.user) | Q(receiver=self.request.user)).order_by(
-            '-updated_at')
+        return Message.objects.filter(Q(sender=self.request.user) | Q(receiver=self.request.user)).select_related(
+            'sender__profile', 'receiver__profile').with_read_state(self.request.user).order_by('-updated_at')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -485,11 +632,9 @@ class MessageListView(UserPassesTestMixin, generic.ListView):
 
     def post(self, request):
         if request.POST['action'] == 'mark_read':
-            message = Message.objects.get(id=request.POST['message_id'])
-            all_messages = MessageContent.objects.filter(message=message)
-            for message in all_messages:
-                message.is_read = True
-                message.save()
+            message = get_object_or_404(Message, Q(sender=request.user) | Q(receiver=request.user),
+                                        pk=request.POST['message_id'])
+            read_conversation(message, request.user)
             data = {
                 'status': 'success',
             }
@@ -519,37 +664,33 @@ class MessageDetailView(UserPassesTestMixin, generic.DetailView):
     def handle_no_permission(self):
         return redirect('index')
 
+    def get_queryset(self):
+        return Message.objects.filter(Q(sender=self.request.user) | Q(receiver=self.request.user)).select_related(
+            'last_content', 'sender__profile', 'receiver__profile').with_read_state(self.request.user)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['active'] = 'messages'
+        context.update(message_history_context(self.request, self.object))
+        # the other participant has read the viewer's last message
+        last_content = self.object.last_content
+        context['seen'] = (last_content is not None and last_content.from_user == context['role'] and
+                           self.object.other_last_read >= last_content.id)
         return context
 
     def get(self, request, *args, **kwargs):
         message = self.get_object()
-        last_message = MessageContent.objects.filter(message=message).order_by('-updated_at').first()
-        if last_message == None:
-            return super().get(request, *args, **kwargs)
-        if last_message.is_read is False:
-            if last_message.from_user == 'receiver':
-                if message.sender == request.user:
-                    last_message.is_read = True
-            else:
-                if message.receiver == request.user:
-                    last_message.is_read = True
-        last_message.save()
+        if message.has_unread(request.user):
+            read_conversation(message, request.user)
         return super().get(request, *args, **kwargs)
 
     def post(self, request, pk):
         if 'send_message' in request.POST:
-            message = Message.objects.get(id=pk)
-            from_user = ''
-            if message.receiver == request.user:
-                from_user = 'receiver'
-            else:
-                from_user = 'sender'
-            new_message = MessageContent.objects.create(message=message, from_user=from_user,
-                                                        content=request.POST['content'])
-            new_message.save()
+            message = get_object_or_404(self.get_queryset(), pk=pk)
+            message_content = send_message(message, request.user, request.POST['content'])
+            if request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
+                # the page shows the message when it comes back over the WebSocket
+                return JsonResponse({'status': 'success', 'id': message_content.id})
             return HttpResponseRedirect(reverse('message_detail', kwargs={'pk': pk}))
         elif request.POST['action'] == 'delete_message':
             Message.objects.get(id=request.POST['message_id']).delete()
@@ -559,11 +700,40 @@ class MessageDetailView(UserPassesTestMixin, generic.DetailView):
             return JsonResponse(data)
 
 
+class MessageHistoryView(View):
+    @staticmethod
+    def get(request, pk):
+        if request.user.is_authenticated:
+            message = get_object_or_404(Message.objects.select_related('sender__profile', 'receiver__profile'),
+                                        Q(sender=request.user) | Q(receiver=request.user), pk=pk)
+            context = message_history_context(request, message, before=decode_cursor(request.GET.get('before')),
+                                              since=decode_cursor(request.GET.get('since')))
+            data = {
+                'status': 'success',
+                'html': render_to_string('message/history_page.html', context, request),
+                'before': context['before_cursor'],
+                'since': context['since_cursor'],
+                'has_more': context['has_more'],
+            }
+            return JsonResponse(data)
+        else:
+            return JsonResponse({'status': 'error'}, status=403)
+
+
+class CacheStatsView(UserPassesTestMixin, View):
+    def test_func(self):
+        return self.request.user.is_staff
+
+    @staticmethod
+    def get(request):
+        return JsonResponse({'status': 'success', 'caches': get_stats()})
+
+
 class NewMessageView(View):
     def get(self, request):
         if request.user.is_authenticated and request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
             data = {}
-            user = User.objects.get(username=request.GET['new_message_username'])
+            user = get_object_or_404(User, username=request.GET['new_message_username'])
             message = Message.objects.filter(
                 Q(sender=user, receiver=request.user) | Q(receiver=user, sender=request.user))
             if message.exists():
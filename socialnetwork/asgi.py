@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'socialnetwork.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once the apps are loaded
+from django.conf import settings  # noqa: E402
+from home.realtime import websocket_application  # noqa: E402
+
+if settings.PRELOAD_TEMPLATES:
+    from home.preload import preload_templates
+    preload_templates()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -57,18 +57,30 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # templates are parsed once per process, the development server
+            # drops them when a template file changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'home.context_processors.badges',
             ],
         },
     },
 ]
 
+# Compile the project's templates when a worker starts rather than on the
+# first requests using them
+PRELOAD_TEMPLATES = not DEBUG
+
 WSGI_APPLICATION = 'socialnetwork.wsgi.application'
 
 
@@ -127,8 +139,153 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTHENTICATION_BACKENDS = ('home.backends.EmailBackend',)
 
+# Seconds a process reuses the user loaded for a session without querying it,
+# the delay before changes made through other processes (deactivation,
+# password change) apply to requests it serves
+USER_CACHE_TIMEOUT = 10
+
+# Users kept per process
+USER_CACHE_MAX_ENTRIES = 10000
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# Flash messages go in a cookie, and in the session only when too large for
+# it, so showing one doesn't write the session
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.fallback.FallbackStorage'
+
+# Sessions
+# cached_db reads sessions from the 'sessions' cache and only queries
+# django_session on a miss, writes go to both. With
+# 'django.contrib.sessions.backends.signed_cookies' the session is kept in a
+# signed cookie and never stored on the server, but logging out doesn't revoke
+# copies of the cookie.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Image variants
+# Resized WebP copies of uploaded images, built in the background after the
+# upload is saved, by model field: name -> (width, height). With a height the
+# image is cropped to that ratio, without it only the width is bounded.
+
+IMAGE_VARIANTS = {
+    'home.Profile.profile_pic': {'small': (96, 96), 'medium': (320, 320)},
+    'home.Profile.cover_pic': {'large': (1200, None)},
+    'home.Post.attachment': {'feed': (720, None)},
+}
+
+# Threads per process building image variants, 0 builds them in the request
+IMAGE_WORKERS = 2
+
+IMAGE_QUALITY = 80
+
+# Cache
+# An LRU private to each process in front of a shared tier all the processes
+# see. LOCAL_TIMEOUT bounds, in seconds, how long a process may serve an entry
+# another process has changed. The shared tier is file based to run without
+# extra services, culled every CULL_INTERVAL seconds rather than on each write;
+# PyMemcacheCache on a unix socket ('unix:/run/memcached.sock') can replace it.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'home.cache.TieredCache',
+        'LOCATION': 'default',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 5,
+            'SHARED': {
+                'BACKEND': 'home.cache.FileCache',
+                'LOCATION': BASE_DIR / 'cache',
+                'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_INTERVAL': 60},
+            },
+        },
+    },
+    # LOCAL_TIMEOUT is the delay for a logout to reach the other processes
+    'sessions': {
+        'BACKEND': 'home.cache.TieredCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 2,
+            'SHARED': {
+                'BACKEND': 'home.cache.FileCache',
+                'LOCATION': BASE_DIR / 'cache' / 'sessions',
+                'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_INTERVAL': 60},
+            },
+        },
+    },
+}
+
+# Seconds a page of a view using CachedViewMixin stays cached, unless the view
+# sets cache_timeout. Changes to what the page depends on evict it earlier.
+VIEW_CACHE_TIMEOUT = 60
+
+# Newsfeed
+# Posts are copied to every friend's feed when created, unless the author has
+# more friends than NEWSFEED_FANOUT_LIMIT: their posts are then merged in on read.
+
+NEWSFEED_FANOUT_LIMIT = 1000
+
+NEWSFEED_BACKFILL_SIZE = 50
+
+NEWSFEED_PAGE_SIZE = 20
+
+# Upper bound for page sizes requested by the client with ?size=
+MAX_PAGE_SIZE = 100
+
+# Reactions
+# When enabled, like/dislike toggles are buffered in memory and written to the
+# database in batches every FLUSH_INTERVAL seconds or FLUSH_SIZE toggles. Every
+# toggle is appended to a journal first and replayed on startup after a crash.
+# Each process writes its own, named after JOURNAL.
+
+REACTION_BUFFER = {
+    'ENABLED': False,
+    'JOURNAL': BASE_DIR / 'reactions.journal',
+    'FLUSH_INTERVAL': 1.0,
+    'FLUSH_SIZE': 500,
+    'FSYNC': False,
+}
+
+# Friends
+# Seconds a user's friend set stays in the cache. Friendship changes evict it.
+
+FRIENDS_CACHE_TIMEOUT = 300
+
+# Number of "people you may know" kept per user by compute_suggestions
+FRIEND_SUGGESTIONS_COUNT = 10
+
+# Search
+# Maximum number of people returned by a search
+
+SEARCH_RESULT_LIMIT = 50
+
+# Seconds before a process rebuilds its in-memory typeahead index from the database,
+# in a background thread. Suggestions come from the people search until the first
+# build is done
+TYPEAHEAD_REFRESH = 300
+
+# Accounts
+# Seconds before a process rebuilds its in-memory Bloom filters of the emails
+# and usernames in use, which answer most signup checks without a query. The
+# rebuild runs in a background thread, checks query the indexes until the first
+# one is done
+
+ACCOUNT_FILTER_REFRESH = 300
+
+# Realtime
+# Publish/subscribe used to push chat messages to WebSocket connections. The
+# default only reaches connections served by the same process.
+
+REALTIME_BROKER = 'home.realtime.LocalBroker'
+
+# Messages shown when opening a conversation and loaded per "older messages" page
+MESSAGE_PAGE_SIZE = 30
+
+# Seconds the navbar badge counters stay cached between recounts
+BADGES_CACHE_TIMEOUT = 3600
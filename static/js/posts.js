@@ -0,0 +1,43 @@
+// Like, dislike and delete buttons of the post cards (post/post_card.html).
+// base.html sets post_urls and csrf_token before loading this script.
+
+// Send ajax post request for post-delete, post_deleted is triggered on the
+// document once done
+function post_delete(post_id) {
+    // Fade out the post slide up
+    $('#post_' + post_id).fadeOut(500);
+    return $.ajax({
+        type: 'POST',
+        url: post_urls.delete,
+        data: {
+            'post_delete_id': post_id,
+            'csrfmiddlewaretoken': csrf_token
+        },
+        dataType: 'json',
+    })
+        .always(function () {
+            $(document).trigger('post_deleted', [post_id]);
+        });
+}
+
+// Send ajax post request for post-like
+function post_like_dislike(post_id, action) {
+    return $.ajax({
+        type: 'POST',
+        url: post_urls.react.replace('/0/', '/' + post_id + '/'),
+        data: {
+            'action': action,
+            'csrfmiddlewaretoken': csrf_token
+        },
+        dataType: 'json',
+    })
+        .done(function (data) {
+            // data contains likes, dislikes, like_class, dislike_class
+            // Update the like/dislike count
+            $('#like_count' + post_id).text(data.likes);
+            $('#dislike_count' + post_id).text(data.dislikes);
+            // Update the like/dislike button
+            $('#post_like_a' + post_id).removeClass().addClass(data.like_class);
+            $('#post_dislike_a' + post_id).removeClass().addClass(data.dislike_class);
+        });
+}